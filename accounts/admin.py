@@ -5,6 +5,16 @@ from accounts.models import User
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
-    fieldsets = DjangoUserAdmin.fieldsets + (("Role", {"fields": ("role",)}),)
+    fieldsets = DjangoUserAdmin.fieldsets + (
+        ("Role", {"fields": ("role", "token_version")}),
+    )
     list_display = ("username", "email", "role", "is_staff", "is_active")
     list_filter = ("role", "is_staff", "is_active")
+    readonly_fields = ("token_version",)
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Tokens carry these as claims, so outstanding ones must not outlive
+        # the change.
+        if change and {"role", "is_staff", "is_active"} & set(form.changed_data):
+            obj.revoke_tokens()
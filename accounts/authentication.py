@@ -0,0 +1,71 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from accounts.models import User, token_state_key
+
+CLAIM_FIELDS = ("username", "role", "is_staff", "token_version")
+
+
+def token_state(user_id):
+    """``(token_version, is_active)`` for ``user_id``, cached briefly."""
+    key = token_state_key(user_id)
+    state = cache.get(key)
+    if state is None:
+        state = (
+            User.objects.filter(pk=user_id)
+            .values_list("token_version", "is_active")
+            .first()
+        )
+        if state is None:
+            return None
+        cache.set(key, state, timeout=settings.TOKEN_STATE_CACHE_TTL)
+    return state
+
+
+def check_token_state(user_id, token_version):
+    state = token_state(user_id)
+    if state is None:
+        raise AuthenticationFailed("User not found", code="user_not_found")
+    current, is_active = state
+    if not is_active:
+        raise AuthenticationFailed("User is inactive", code="user_inactive")
+    if token_version != current:
+        raise AuthenticationFailed("Token has been revoked", code="token_revoked")
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that builds the user from the token's claims.
+
+    ``CustomTokenObtainPairSerializer`` signs the fields in ``CLAIM_FIELDS``
+    into every token, which covers what the permission and role checks
+    read. The user comes from ``User.from_db`` with only those fields, so
+    anything else is deferred and loads on first access. Revocation and
+    deactivation are checked against a cached ``token_state`` lookup that
+    may lag by up to ``TOKEN_STATE_CACHE_TTL`` seconds on other workers.
+    Tokens issued before these claims existed use the database lookup.
+    """
+
+    def get_user(self, validated_token):
+        if any(claim not in validated_token for claim in CLAIM_FIELDS):
+            user = super().get_user(validated_token)
+            if validated_token.get("token_version", 0) != user.token_version:
+                raise AuthenticationFailed(
+                    "Token has been revoked", code="token_revoked"
+                )
+            return user
+
+        claims = {
+            "id": validated_token[api_settings.USER_ID_CLAIM],
+            **{claim: validated_token[claim] for claim in CLAIM_FIELDS},
+        }
+        check_token_state(claims["id"], claims["token_version"])
+        # from_db wants values in concrete field order; the rest are deferred.
+        fields = [f.attname for f in User._meta.concrete_fields if f.attname in claims]
+        return User.from_db(
+            DEFAULT_DB_ALIAS, fields, [claims[field] for field in fields]
+        )
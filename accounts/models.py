@@ -1,5 +1,11 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import F
+
+
+def token_state_key(user_id):
+    return f"accounts:token_state:{user_id}"
 
 
 class User(AbstractUser):
@@ -10,6 +16,14 @@ class User(AbstractUser):
         (ROLE_SELLER, "Seller"),
     ]
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default=ROLE_CUSTOMER)
+    token_version = models.PositiveIntegerField(
+        default=0, help_text="Bumped to revoke every token issued so far."
+    )
 
     def __str__(self):
         return f"{self.username} ({self.role})"
+
+    def revoke_tokens(self):
+        User.objects.filter(pk=self.pk).update(token_version=F("token_version") + 1)
+        self.refresh_from_db(fields=["token_version"])
+        transaction.on_commit(lambda: cache.delete(token_state_key(self.pk)))
@@ -1,13 +1,19 @@
 from django.contrib.auth.password_validation import validate_password
 from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer,
+    TokenRefreshSerializer,
+)
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework_simplejwt.tokens import Token
 
+from accounts.authentication import check_token_state
+from food_delivery.metrics import TimedSerializerMixin
 from accounts.models import User
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ["id", "username", "email", "first_name", "last_name", "role"]
@@ -61,6 +67,8 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         token = super().get_token(user)
         token["username"] = user.username
         token["role"] = user.role
+        token["is_staff"] = user.is_staff
+        token["token_version"] = user.token_version
         return token
 
     def validate(self, attrs):
@@ -76,3 +84,12 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
             }
         )
         return data
+
+
+class VersionedTokenRefreshSerializer(TokenRefreshSerializer):
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        check_token_state(
+            refresh[api_settings.USER_ID_CLAIM], refresh.get("token_version", 0)
+        )
+        return super().validate(attrs)
@@ -1,3 +1,74 @@
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
 
-# Create your tests here.
+from accounts.models import User
+from accounts.serializers import CustomTokenObtainPairSerializer
+
+
+class ClaimsAuthenticationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username="customer", password="pass", email="c@example.com"
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def authenticate(self, token):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def login(self):
+        response = self.client.post(
+            "/api/accounts/token/", {"username": "customer", "password": "pass"}
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def user_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [q["sql"] for q in ctx if "accounts_user" in q["sql"]]
+
+    def test_claims_token_skips_the_user_query_once_cached(self):
+        self.authenticate(self.login()["access"])
+        self.assertEqual(len(self.user_queries("/api/orders/orders/")), 1)
+        self.assertEqual(self.user_queries("/api/orders/orders/"), [])
+
+        # A token without the claims still works through the full lookup.
+        self.authenticate(AccessToken.for_user(self.user))
+        self.assertEqual(len(self.user_queries("/api/orders/orders/")), 1)
+
+    def test_me_loads_the_full_user(self):
+        self.authenticate(self.login()["access"])
+        response = self.client.get("/api/accounts/me/")
+        self.assertEqual(response.data["email"], "c@example.com")
+        self.assertEqual(response.data["role"], User.ROLE_CUSTOMER)
+
+    def test_revoke_rejects_access_and_refresh_tokens(self):
+        tokens = self.login()
+        self.authenticate(tokens["access"])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/accounts/token/revoke/")
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.client.get("/api/orders/orders/").status_code, 401)
+
+        self.client.credentials()
+        response = self.client.post(
+            "/api/accounts/token/refresh/", {"refresh": tokens["refresh"]}
+        )
+        self.assertEqual(response.status_code, 401)
+        self.authenticate(self.login()["access"])
+        self.assertEqual(self.client.get("/api/orders/orders/").status_code, 200)
+
+    def test_inactive_user_is_rejected(self):
+        token = CustomTokenObtainPairSerializer.get_token(self.user).access_token
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.authenticate(token)
+        self.assertEqual(self.client.get("/api/orders/orders/").status_code, 401)
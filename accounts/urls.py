@@ -1,10 +1,16 @@
 from django.urls import path
 from rest_framework_simplejwt.views import TokenRefreshView
-from accounts.views import RegisterAPIView, CustomTokenObtainPairView, MeAPIView
+from accounts.views import (
+    RegisterAPIView,
+    CustomTokenObtainPairView,
+    MeAPIView,
+    RevokeTokensAPIView,
+)
 
 urlpatterns = [
     path("register/", RegisterAPIView.as_view(), name="register"),
     path("token/", CustomTokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
+    path("token/revoke/", RevokeTokensAPIView.as_view(), name="token_revoke"),
     path("me/", MeAPIView.as_view(), name="me"),
 ]
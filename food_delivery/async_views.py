@@ -0,0 +1,76 @@
+"""
+Async read paths for DRF viewsets.
+
+DRF dispatches synchronously, so ``async_read_view`` drives a viewset by
+hand: authentication, permission and throttle checks run through the
+viewset's own ``initial()`` in one worker-thread hop, then the queryset is
+evaluated with the async ORM on the event loop, so a slow query holds no
+thread while it waits. Viewsets opt in with ``AsyncReadMixin``.
+"""
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.http import Http404
+from rest_framework.exceptions import MethodNotAllowed
+from rest_framework.response import Response
+
+
+class AsyncReadMixin:
+    async def alist(self, request, *args, **kwargs):
+        queryset = await sync_to_async(self.get_list_queryset)()
+        page = await self.paginator.apaginate_queryset(queryset, request, view=self)
+        data = self.get_serializer(page, many=True).data
+        return await self.aget_paginated_response(data)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        instance = await self.aget_object()
+        return Response(self.get_serializer(instance).data)
+
+    def get_list_queryset(self):
+        # Building the queryset may itself query (a search lookup, say), so
+        # it runs in the worker thread; evaluating it does not.
+        return self.filter_queryset(self.get_queryset())
+
+    async def aget_paginated_response(self, data):
+        return self.get_paginated_response(data)
+
+    async def aget_object(self):
+        queryset = await sync_to_async(self.get_list_queryset)()
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        lookup = {self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        try:
+            obj = await queryset.aget(**lookup)
+        except (queryset.model.DoesNotExist, TypeError, ValueError, ValidationError):
+            raise Http404(f"No {queryset.model._meta.object_name} matches the query.")
+        await sync_to_async(self.check_object_permissions)(self.request, obj)
+        return obj
+
+
+def async_read_view(viewset_class, action, **initkwargs):
+    """
+    An async Django view serving ``action`` ("list" or "retrieve") of
+    ``viewset_class`` through its ``a<action>`` handler, for GET and HEAD.
+    """
+    handler_name = f"a{action}"
+
+    async def view(request, *args, **kwargs):
+        self = viewset_class(**initkwargs)
+        self.action_map = {"get": action, "head": action}
+        self.action = action
+        self.args = args
+        self.kwargs = kwargs
+        self.format_kwarg = None
+        self.request = request = self.initialize_request(request, *args, **kwargs)
+        self.headers = self.default_response_headers
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            if request.method not in ("GET", "HEAD"):
+                raise MethodNotAllowed(request.method)
+            response = await getattr(self, handler_name)(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    view.csrf_exempt = True
+    return view
@@ -0,0 +1,73 @@
+"""
+Read-replica routing.
+
+``ReplicaReadMiddleware`` marks safe requests under ``REPLICA_READ_PATHS``
+and ``ReplicaRouter`` sends that request's catalog and review reads to the
+"replica" alias; the router is only installed when a replica is
+configured. Everything else, including authentication lookups and any
+read made inside a transaction, stays on "default", so a write path never
+reads its own rows back from a lagging replica.
+"""
+
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+REPLICA = "replica"
+REPLICA_APPS = {"products", "reviews"}
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+use_replica = ContextVar("use_replica", default=False)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (
+            use_replica.get()
+            and model._meta.app_label in REPLICA_APPS
+            and not connections["default"].in_atomic_block
+        ):
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == "default"
+
+
+class ReplicaReadMiddleware:
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def wants_replica(self, request):
+        return request.method in SAFE_METHODS and request.path.startswith(
+            settings.REPLICA_READ_PATHS
+        )
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = use_replica.set(self.wants_replica(request))
+        try:
+            return self.get_response(request)
+        finally:
+            use_replica.reset(token)
+
+    async def __acall__(self, request):
+        token = use_replica.set(self.wants_replica(request))
+        try:
+            return await self.get_response(request)
+        finally:
+            use_replica.reset(token)
@@ -0,0 +1,237 @@
+"""
+Per-route request metrics.
+
+``MetricsMiddleware`` times every request and, through a database execute
+wrapper, counts its queries and their time; serializers building response
+data report theirs via ``TimedSerializerMixin`` (``RowSerializer`` does so
+itself) and DRF renderers via ``TimedRendererMixin``. Observations go into in-process
+histograms labelled by the resolved URL name (``order-list``,
+``product-detail``...) and method, served in the Prometheus text format by
+``metrics_view``. Each worker process exports its own series.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+current = ContextVar("request_metrics", default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.serializing = False
+        self.render_time = 0.0
+        self.total_time = None
+
+    def server_timing(self):
+        return (
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries", '
+            f"serialize;dur={self.serialize_time * 1000:.1f}, "
+            f"render;dur={self.render_time * 1000:.1f}, "
+            f"total;dur={self.total_time * 1000:.1f}"
+        )
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets, labelnames=("route", "method")):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self.labelnames = labelnames
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            counts, total = self.series.get(labels, ([0] * (len(self.buckets) + 1), 0))
+            counts[index] += 1
+            self.series[labels] = (counts, total + value)
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self.lock:
+            series = sorted(
+                (labels, list(c), s) for labels, (c, s) in self.series.items()
+            )
+        for values, counts, total in series:
+            labels = ",".join(
+                f'{name}="{value}"' for name, value in zip(self.labelnames, values)
+            )
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                lines.append(
+                    f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+                )
+            lines.append(f"{self.name}_sum{{{labels}}} {total}")
+            lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+        return "\n".join(lines)
+
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Total request latency.", DURATION_BUCKETS
+)
+DB_SECONDS = Histogram(
+    "http_request_db_seconds", "Time spent in database queries.", DURATION_BUCKETS
+)
+SERIALIZE_SECONDS = Histogram(
+    "http_request_serialize_seconds",
+    "Time spent building response data in serializers.",
+    DURATION_BUCKETS,
+)
+RENDER_SECONDS = Histogram(
+    "http_request_render_seconds", "Time spent rendering responses.", DURATION_BUCKETS
+)
+QUERIES = Histogram(
+    "http_request_queries", "Database queries per request.", QUERY_BUCKETS
+)
+HISTOGRAMS = (REQUEST_SECONDS, DB_SECONDS, SERIALIZE_SECONDS, RENDER_SECONDS, QUERIES)
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += time.perf_counter() - started
+
+
+def install_wrapper(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+# Async views run their queries on worker threads whose connections open
+# later; the context variable follows the request into those threads.
+connection_created.connect(install_wrapper)
+
+
+@contextmanager
+def timed_serialization():
+    """
+    Add the enclosed time to the request's serializer time. Nested
+    serializers inside an outer one are not counted twice; queries they run
+    count towards both this and the database time.
+    """
+    metrics = current.get()
+    if metrics is None or metrics.serializing:
+        yield
+        return
+    metrics.serializing = True
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serializing = False
+        metrics.serialize_time += time.perf_counter() - started
+
+
+class TimedSerializerMixin:
+    """For DRF serializers whose output goes into responses."""
+
+    def to_representation(self, instance):
+        with timed_serialization():
+            return super().to_representation(instance)
+
+
+class TimedRendererMixin:
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        metrics = current.get()
+        started = time.perf_counter()
+        try:
+            return super().render(data, accepted_media_type, renderer_context)
+        finally:
+            if metrics is not None:
+                metrics.render_time += time.perf_counter() - started
+
+
+class TimedJSONRenderer(TimedRendererMixin, JSONRenderer):
+    pass
+
+
+class TimedBrowsableAPIRenderer(TimedRendererMixin, BrowsableAPIRenderer):
+    pass
+
+
+class MetricsMiddleware:
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def start(self, request):
+        for connection in connections.all(initialized_only=True):
+            install_wrapper(connection)
+        request.metrics = RequestMetrics()
+        return current.set(request.metrics)
+
+    def finish(self, request, response, token):
+        current.reset(token)
+        metrics = request.metrics
+        metrics.total_time = time.perf_counter() - metrics.started
+        match = getattr(request, "resolver_match", None)
+        labels = ((match and match.url_name) or "unmatched", request.method)
+        REQUEST_SECONDS.observe(labels, metrics.total_time)
+        DB_SECONDS.observe(labels, metrics.db_time)
+        SERIALIZE_SECONDS.observe(labels, metrics.serialize_time)
+        RENDER_SECONDS.observe(labels, metrics.render_time)
+        QUERIES.observe(labels, metrics.queries)
+        response.headers["Server-Timing"] = metrics.server_timing()
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = self.start(request)
+        return self.finish(request, self.get_response(request), token)
+
+    async def __acall__(self, request):
+        token = self.start(request)
+        return self.finish(request, await self.get_response(request), token)
+
+
+def exposition(histograms=HISTOGRAMS):
+    return "\n".join(histogram.render() for histogram in histograms) + "\n"
+
+
+def metrics_view(request):
+    token = settings.METRICS_TOKEN
+    if token:
+        allowed = constant_time_compare(
+            request.headers.get("Authorization", ""), f"Bearer {token}"
+        )
+    else:
+        allowed = request.user.is_authenticated and request.user.is_staff
+    if not allowed:
+        return HttpResponse(status=401)
+    return HttpResponse(exposition(), content_type=CONTENT_TYPE)
@@ -0,0 +1,57 @@
+from decimal import Decimal
+
+from django.utils import timezone
+
+from food_delivery.metrics import timed_serialization
+
+CENT = Decimal("0.01")
+
+
+def decimal_str(value, places=CENT):
+    """Match ``serializers.DecimalField`` output (coerced to string)."""
+    if value is None:
+        return None
+    return f"{value.quantize(places):f}"
+
+
+def datetime_str(value):
+    """Match ``serializers.DateTimeField`` ISO 8601 output."""
+    if value is None:
+        return None
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    text = value.isoformat()
+    if text.endswith("+00:00"):
+        text = text[:-6] + "Z"
+    return text
+
+
+class RowSerializer:
+    """
+    Read-only stand-in for a ``ModelSerializer`` over ``values()`` rows.
+
+    Subclasses list the lookups to fetch in ``fields`` and turn one row into
+    its response dict in ``to_representation``; ``to_representation_many``
+    is the hook for loading nested rows for a whole page in one query. The
+    output must stay byte-for-byte identical to the serializer it replaces.
+    """
+
+    fields = ()
+
+    def __init__(self, instance=None, many=False, context=None, **kwargs):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+
+    @property
+    def data(self):
+        with timed_serialization():
+            if self.many:
+                return self.to_representation_many(list(self.instance))
+            return self.to_representation_many([self.instance])[0]
+
+    def to_representation_many(self, rows):
+        return [self.to_representation(row) for row in rows]
+
+    def to_representation(self, row):
+        raise NotImplementedError
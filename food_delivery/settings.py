@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -50,13 +51,18 @@ AUTH_USER_MODEL = "accounts.User"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "accounts.authentication.ClaimsJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticated",),
+    "DEFAULT_PAGINATION_CLASS": "food_delivery.pagination.KeysetPagination",
+    "DEFAULT_RENDERER_CLASSES": [
+        "food_delivery.metrics.TimedJSONRenderer",
+        "food_delivery.metrics.TimedBrowsableAPIRenderer",
+    ],
     "DEFAULT_THROTTLE_CLASSES": [
-        "rest_framework.throttling.AnonRateThrottle",
-        "rest_framework.throttling.UserRateThrottle",
-        "rest_framework.throttling.ScopedRateThrottle",
+        "food_delivery.throttling.AnonRateThrottle",
+        "food_delivery.throttling.UserRateThrottle",
+        "food_delivery.throttling.ScopedRateThrottle",
     ],
     "DEFAULT_THROTTLE_RATES": {
         "anon": "100/day",
@@ -64,6 +70,7 @@ REST_FRAMEWORK = {
         "auth": "10/min",
         "register": "5/hour",
         "orders": "5/min",
+        "seller_queue": "60/min",
         "reviews": "10/hour",
     },
 }
@@ -72,12 +79,21 @@ SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=30),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
     "AUTH_HEADER_TYPES": ("Bearer",),
+    "TOKEN_REFRESH_SERIALIZER": "accounts.serializers.VersionedTokenRefreshSerializer",
 }
+# When set, /metrics requires "Authorization: Bearer <METRICS_TOKEN>";
+# otherwise only logged-in staff may read it.
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+# How long another worker may keep honouring a revoked token.
+TOKEN_STATE_CACHE_TTL = int(os.environ.get("TOKEN_STATE_CACHE_TTL", 30))
 
 MIDDLEWARE = [
+    "food_delivery.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
+    "food_delivery.db.ReplicaReadMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
@@ -107,11 +123,116 @@ WSGI_APPLICATION = "food_delivery.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+DATABASE_ENGINE = os.environ.get("DATABASE_ENGINE", "sqlite")
+
+if DATABASE_ENGINE == "postgresql":
+    # With DATABASE_POOL on, each worker process keeps a psycopg pool and
+    # CONN_MAX_AGE must stay 0; without it, connections persist per thread.
+    DATABASE_POOL = os.environ.get("DATABASE_POOL", "1") == "1"
+
+    def postgres(host):
+        return {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("DATABASE_NAME", "food_delivery"),
+            "USER": os.environ.get("DATABASE_USER", "food_delivery"),
+            "PASSWORD": os.environ.get("DATABASE_PASSWORD", ""),
+            "HOST": host,
+            "PORT": os.environ.get("DATABASE_PORT", "5432"),
+            "CONN_MAX_AGE": (
+                0 if DATABASE_POOL else int(os.environ.get("CONN_MAX_AGE", 60))
+            ),
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": (
+                {
+                    "pool": {
+                        "min_size": int(os.environ.get("DATABASE_POOL_MIN", 2)),
+                        "max_size": int(os.environ.get("DATABASE_POOL_MAX", 10)),
+                        "timeout": int(os.environ.get("DATABASE_POOL_TIMEOUT", 10)),
+                    }
+                }
+                if DATABASE_POOL
+                else {}
+            ),
+        }
+
+    DATABASES = {"default": postgres(os.environ.get("DATABASE_HOST", "localhost"))}
+    if os.environ.get("DATABASE_REPLICA_HOST"):
+        DATABASES["replica"] = postgres(os.environ["DATABASE_REPLICA_HOST"])
+        DATABASES["replica"]["TEST"] = {"MIRROR": "default"}
+        DATABASE_ROUTERS = ["food_delivery.db.ReplicaRouter"]
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ.get("DATABASE_NAME", BASE_DIR / "db.sqlite3"),
+            "OPTIONS": {
+                # WAL lets readers run alongside the single writer; IMMEDIATE
+                # takes the write lock at BEGIN, so writers queue on the busy
+                # timeout instead of failing to upgrade a read lock mid-way.
+                "init_command": "PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;",
+                "timeout": int(os.environ.get("SQLITE_TIMEOUT", 20)),
+                "transaction_mode": "IMMEDIATE",
+            },
+        }
     }
+
+# Safe requests under these prefixes read from the "replica" alias, when
+# one is configured; see food_delivery.db.
+REPLICA_READ_PATHS = ("/api/products/", "/api/reviews/")
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# The catalog response cache defaults to per-process local memory (LRU,
+# bounded by MAX_ENTRIES). Point CATALOG_CACHE_BACKEND at
+# django.core.cache.backends.redis.RedisCache and CATALOG_CACHE_LOCATION at a
+# redis:// URL to share it between workers; configure the server with an LRU
+# maxmemory-policy for eviction there.
+CATALOG_CACHE_ALIAS = "catalog"
+CATALOG_CACHE_TTL = int(os.environ.get("CATALOG_CACHE_TTL", 300))
+CATALOG_FACET_TTL = int(os.environ.get("CATALOG_FACET_TTL", 60))
+CATALOG_CACHE_BACKEND = os.environ.get(
+    "CATALOG_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+)
+
+ORDER_EVENTS_BROKER = os.environ.get(
+    "ORDER_EVENTS_BROKER", "orders.events.InProcessBroker"
+)
+ORDER_EVENTS_HEARTBEAT = int(os.environ.get("ORDER_EVENTS_HEARTBEAT", 15))
+
+# Throttle counters must live in a cache every worker shares (Redis or
+# Memcached) for limits to hold across processes; local memory only
+# suits development and tests.
+THROTTLE_CACHE_ALIAS = "default"
+
+# Idempotency-Key on order writes: stored responses replay for
+# IDEMPOTENCY_KEY_TTL seconds. The in-flight lock lives in the cache and
+# expires after IDEMPOTENCY_LOCK_TIMEOUT, so like the throttle counters it
+# needs a cache every worker shares; a duplicate waits up to
+# IDEMPOTENCY_WAIT seconds for the first request before getting a 409.
+IDEMPOTENCY_CACHE_ALIAS = "default"
+IDEMPOTENCY_KEY_TTL = int(os.environ.get("IDEMPOTENCY_KEY_TTL", 24 * 60 * 60))
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.environ.get("IDEMPOTENCY_LOCK_TIMEOUT", 60))
+IDEMPOTENCY_WAIT = float(os.environ.get("IDEMPOTENCY_WAIT", 10))
+
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("CACHE_LOCATION", ""),
+    },
+    CATALOG_CACHE_ALIAS: {
+        "BACKEND": CATALOG_CACHE_BACKEND,
+        "LOCATION": os.environ.get("CATALOG_CACHE_LOCATION", "catalog"),
+        "TIMEOUT": CATALOG_CACHE_TTL,
+        "OPTIONS": (
+            {"MAX_ENTRIES": int(os.environ.get("CATALOG_CACHE_MAX_ENTRIES", 5000))}
+            if CATALOG_CACHE_BACKEND.endswith("LocMemCache")
+            else {}
+        ),
+    },
 }
 
 
@@ -0,0 +1,51 @@
+import re
+
+from django.db import connection
+
+# A bare "SCAN <table>" in SQLite's query plan is a full table scan; scans
+# "USING INDEX" walk an index in order and are what keyset listings want.
+TABLE_SCAN = re.compile(r"\bSCAN (?!.*\bUSING\b)(\w+)")
+
+
+class QueryPlanAssertionsMixin:
+    """Assertions over ``EXPLAIN`` output for the tests' SQLite database."""
+
+    def query_plan(self, queryset):
+        if connection.vendor != "sqlite":
+            self.skipTest("query plan assertions are written for SQLite")
+        return queryset.explain()
+
+    def assertUsesIndex(self, queryset, index=None):
+        plan = self.query_plan(queryset)
+        scans = TABLE_SCAN.findall(plan)
+        self.assertFalse(scans, f"full table scan of {scans}:\n{plan}")
+        self.assertNotIn("USE TEMP B-TREE FOR ORDER BY", plan, plan)
+        if index is None:
+            # Without a named index, at least one table must be reached by
+            # an index lookup rather than walked end to end.
+            self.assertIn("SEARCH", plan, plan)
+        else:
+            self.assertIn(index, plan, plan)
+
+
+class QueryBudgetMixin:
+    """
+    Per-route query budgets for API tests.
+
+    Declare ``query_budgets = {"order-list": 3}`` on the test case and pass
+    responses to ``assertWithinQueryBudget``. The count comes from
+    ``MetricsMiddleware``, so it covers the whole request, authentication
+    and throttling included.
+    """
+
+    query_budgets = {}
+
+    def assertWithinQueryBudget(self, response):
+        request = getattr(response, "wsgi_request", None) or response.asgi_request
+        route = request.resolver_match.url_name
+        self.assertIn(route, self.query_budgets, f"no query budget for {route}")
+        budget = self.query_budgets[route]
+        queries = request.metrics.queries
+        self.assertLessEqual(
+            queries, budget, f"{route} ran {queries} queries; its budget is {budget}"
+        )
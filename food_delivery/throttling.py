@@ -0,0 +1,61 @@
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import throttling
+
+
+class FixedWindowRateThrottle(throttling.SimpleRateThrottle):
+    """
+    Rate throttle that keeps one counter per client and window.
+
+    ``SimpleRateThrottle`` reads, trims and rewrites a list of request
+    timestamps on every call, which costs O(rate) and loses updates when
+    workers race. Here each request is a single ``add`` or ``incr`` on the
+    shared cache, both atomic in Redis, Memcached and the local-memory
+    backend. As with any fixed window, a client can get up to twice the
+    rate through across a window boundary.
+    """
+
+    @property
+    def cache(self):
+        return caches[settings.THROTTLE_CACHE_ALIAS]
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        window = int(self.now // self.duration)
+        self.window_end = (window + 1) * self.duration
+        key = f"{self.key}:{window}"
+        # One spare second so the counter outlives its window on every node.
+        timeout = self.duration + 1
+        if self.cache.add(key, 1, timeout=timeout):
+            count = 1
+        else:
+            try:
+                count = self.cache.incr(key)
+            except ValueError:
+                # Expired between the add and the incr: this is a new window.
+                self.cache.add(key, 1, timeout=timeout)
+                count = 1
+        return count <= self.num_requests
+
+    def wait(self):
+        return max(self.window_end - self.now, 0)
+
+
+class AnonRateThrottle(FixedWindowRateThrottle, throttling.AnonRateThrottle):
+    pass
+
+
+class UserRateThrottle(FixedWindowRateThrottle, throttling.UserRateThrottle):
+    pass
+
+
+class ScopedRateThrottle(throttling.ScopedRateThrottle, FixedWindowRateThrottle):
+    # DRF's class picks the rate from the view's scope, then defers to
+    # FixedWindowRateThrottle.allow_request through the MRO.
+    pass
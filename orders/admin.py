@@ -1,5 +1,5 @@
 from django.contrib import admin
-from orders.models import OrderItem, Order
+from orders.models import OrderItem, Order, OutboxEvent
 
 
 class OrderItemInline(admin.TabularInline):
@@ -16,3 +16,10 @@ class OrderAdmin(admin.ModelAdmin):
     list_filter = ("status", "created_at")
     search_fields = ("user__username", "id")
     inlines = [OrderItemInline]
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ("id", "topic", "handler", "status", "attempts", "created_at")
+    list_filter = ("status", "topic", "handler")
+    readonly_fields = ("topic", "handler", "payload", "created_at", "last_error")
@@ -0,0 +1,135 @@
+"""
+Order status events.
+
+Writers call ``publish_status`` inside their transaction. A broker fans a
+channel's messages out to every current subscriber; ``ORDER_EVENTS_BROKER``
+names the class to use. ``InProcessBroker`` only reaches subscribers in the
+process that publishes, so with it the event is published on commit by the
+process that made the change, which covers tests and single-process
+deployments. A broker backed by Redis or PostgreSQL ``LISTEN``/``NOTIFY``,
+with the same methods and ``in_process = False``, reaches every process;
+with one the event is written to the outbox with the change and published
+when ``run_outbox_worker`` runs ``orders.handlers.broadcast_status``.
+"""
+
+import asyncio
+import functools
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from food_delivery.readers import datetime_str
+from orders import outbox
+
+STATUS_CHANGED = "order.status_changed"
+DELIVERED = "order.delivered"
+
+
+class Subscription:
+    """
+    One subscriber's mailbox, bound to the event loop that created it.
+
+    ``deliver`` may be called from any thread. The queue is bounded and
+    drops the oldest message when full, so a stalled client cannot make a
+    publisher block or grow memory without limit.
+    """
+
+    max_pending = 16
+
+    def __init__(self, broker, channel):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=self.max_pending)
+
+    def deliver(self, message):
+        try:
+            self.loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            # The subscriber's loop is gone; it will unsubscribe on its way out.
+            pass
+
+    def _put(self, message):
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout=None):
+        """Next message, or ``None`` if ``timeout`` seconds pass first."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    # Subscribers in other processes (the web workers, when the outbox
+    # worker publishes) never see these messages.
+    in_process = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(message)
+        return len(subscribers)
+
+    def subscribe(self, channel):
+        """Must be called from the event loop that will read the messages."""
+        subscription = Subscription(self, channel)
+        with self._lock:
+            self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    def subscriber_count(self, channel):
+        with self._lock:
+            return len(self._subscribers.get(channel, ()))
+
+
+@functools.cache
+def get_broker():
+    return import_string(settings.ORDER_EVENTS_BROKER)()
+
+
+def order_channel(order_id):
+    return f"order:{order_id}"
+
+
+def status_event(order):
+    return {
+        "id": order.pk,
+        "status": order.status,
+        "updated_at": datetime_str(order.updated_at),
+    }
+
+
+def publish_status(order):
+    """Announce ``order``'s current status once the transaction commits."""
+    event = status_event(order)
+    broker = get_broker()
+    if getattr(broker, "in_process", False):
+        transaction.on_commit(lambda: broker.publish(order_channel(order.pk), event))
+    else:
+        outbox.emit(STATUS_CHANGED, event)
+
+
+def publish_delivered(order):
+    outbox.emit(DELIVERED, {"order": order.pk, "user": order.user_id})
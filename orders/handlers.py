@@ -0,0 +1,16 @@
+"""Outbox handlers for order events; registered from ``OrdersConfig.ready``."""
+
+from orders import outbox
+from orders.events import DELIVERED, STATUS_CHANGED, get_broker, order_channel
+from orders.models import Order, VerifiedPurchase
+
+
+@outbox.handler(STATUS_CHANGED)
+def broadcast_status(payload):
+    # Only emitted for brokers that reach other processes; see orders.events.
+    get_broker().publish(order_channel(payload["id"]), payload)
+
+
+@outbox.handler(DELIVERED)
+def record_verified_purchases(payload):
+    VerifiedPurchase.record(Order(pk=payload["order"], user_id=payload["user"]))
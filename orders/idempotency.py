@@ -0,0 +1,202 @@
+"""
+``Idempotency-Key`` support for order writes.
+
+A client that retries a write with the same key gets the first response
+back instead of a second execution. Completed responses (anything below
+500) are kept in ``IdempotencyKey`` and copied into the cache, which
+answers most replays without a query. While the first request runs it
+holds a lock taken with ``cache.add``; a duplicate polls the cache for the
+stored response and gives up with a 409 after ``IDEMPOTENCY_WAIT``
+seconds. A request that raises or answers 5xx stores nothing, so its
+retry runs again.
+
+The response is stored after the write commits. If the process dies in
+between, the lock expires after ``IDEMPOTENCY_LOCK_TIMEOUT`` and a retry
+runs the write a second time.
+"""
+
+import hashlib
+import json
+import time
+import uuid
+from datetime import timedelta
+from functools import cached_property, wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from rest_framework import status as http_status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from orders.models import IdempotencyKey
+
+HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = IdempotencyKey._meta.get_field("key").max_length
+POLL_INTERVAL = 0.05
+
+
+def get_cache():
+    return caches[settings.IDEMPOTENCY_CACHE_ALIAS]
+
+
+class Entry:
+    """The stored response and in-flight lock for one user's key."""
+
+    def __init__(self, request, key):
+        self.request = request
+        self.key = key
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        self.cache_key = f"idempotency:{request.user.pk}:{digest}"
+        self.lock_key = f"{self.cache_key}:lock"
+        self.token = None
+
+    @cached_property
+    def fingerprint(self):
+        body = json.dumps(self.request.data, sort_keys=True, cls=JSONEncoder)
+        raw = f"{self.request.method}|{self.request.get_full_path()}|{body}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def cached(self):
+        return get_cache().get(self.cache_key)
+
+    def replay(self, stored):
+        if stored["fingerprint"] != self.fingerprint:
+            return Response(
+                {"detail": f"This {HEADER} was used for a different request."},
+                status=http_status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        return Response(
+            stored["data"],
+            status=stored["status"],
+            headers={REPLAYED_HEADER: "true"},
+        )
+
+    def claim(self):
+        """
+        Take the in-flight lock and return ``None``, or return the response
+        to send instead of running the request.
+        """
+        cache = get_cache()
+        if (stored := self.cached()) is not None:
+            return self.replay(stored)
+        # The fingerprint lets is_duplicate tell a retry from a reused key.
+        lock = {"token": uuid.uuid4().hex, "fingerprint": self.fingerprint}
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT
+        while not cache.add(
+            self.lock_key, lock, timeout=settings.IDEMPOTENCY_LOCK_TIMEOUT
+        ):
+            if time.monotonic() >= deadline:
+                return Response(
+                    {"detail": f"A request with this {HEADER} is still running."},
+                    status=http_status.HTTP_409_CONFLICT,
+                )
+            time.sleep(POLL_INTERVAL)
+            if (stored := self.cached()) is not None:
+                return self.replay(stored)
+        self.token = lock["token"]
+        # The cache may have dropped the response; the table still has it.
+        record = IdempotencyKey.objects.filter(
+            user=self.request.user, key=self.key, expires_at__gt=timezone.now()
+        ).first()
+        if record is None:
+            return None
+        stored = {
+            "fingerprint": record.fingerprint,
+            "status": record.status_code,
+            "data": record.response,
+        }
+        self.release(stored)
+        return self.replay(stored)
+
+    def save(self, response):
+        if response.status_code >= 500:
+            return
+        stored = {
+            "fingerprint": self.fingerprint,
+            "status": response.status_code,
+            # As the renderer would encode it, so every replay matches.
+            "data": json.loads(json.dumps(response.data, cls=JSONEncoder)),
+        }
+        IdempotencyKey.objects.bulk_create(
+            [
+                IdempotencyKey(
+                    user=self.request.user,
+                    key=self.key,
+                    fingerprint=stored["fingerprint"],
+                    status_code=stored["status"],
+                    response=stored["data"],
+                    expires_at=timezone.now()
+                    + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+                )
+            ],
+            # An expired row with the same key is overwritten in place.
+            update_conflicts=True,
+            unique_fields=["user", "key"],
+            update_fields=["fingerprint", "status_code", "response", "expires_at"],
+        )
+        return stored
+
+    def release(self, stored=None):
+        """Publish ``stored`` to waiting duplicates, then drop the lock."""
+        cache = get_cache()
+        if stored is not None:
+            cache.set(self.cache_key, stored, timeout=settings.IDEMPOTENCY_KEY_TTL)
+        # Only drop the lock if it is still ours rather than a successor's
+        # taken after it expired.
+        if self.token is not None:
+            lock = cache.get(self.lock_key)
+            if lock is not None and lock["token"] == self.token:
+                cache.delete(self.lock_key)
+        self.token = None
+
+
+def valid_key(key):
+    return 0 < len(key) <= MAX_KEY_LENGTH
+
+
+def is_duplicate(request):
+    """
+    Whether ``request`` repeats one that is running or has a stored response,
+    going by the cache alone. Only meaningful for ``@idempotent`` views.
+    """
+    key = request.headers.get(HEADER)
+    if key is None or not valid_key(key):
+        return False
+    entry = Entry(request, key)
+    found = get_cache().get_many([entry.cache_key, entry.lock_key])
+    return any(value["fingerprint"] == entry.fingerprint for value in found.values())
+
+
+def idempotent(func):
+    """
+    Make the decorated view method honour ``Idempotency-Key``. Put it above
+    ``atomic_with_retry`` so waiting and storing happen outside the write's
+    transaction.
+    """
+
+    @wraps(func)
+    def wrapper(view, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return func(view, request, *args, **kwargs)
+        if not valid_key(key):
+            return Response(
+                {"detail": f"{HEADER} must be 1 to {MAX_KEY_LENGTH} characters."},
+                status=http_status.HTTP_400_BAD_REQUEST,
+            )
+        entry = Entry(request, key)
+        response = entry.claim()
+        if response is not None:
+            return response
+        stored = None
+        try:
+            response = func(view, request, *args, **kwargs)
+            stored = entry.save(response)
+        finally:
+            entry.release(stored)
+        return response
+
+    wrapper.idempotent = True
+    return wrapper
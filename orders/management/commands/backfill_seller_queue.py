@@ -0,0 +1,42 @@
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from orders.models import OrderItem, SellerOrder
+
+
+class Command(BaseCommand):
+    help = "Rebuild the seller order queues from the open orders' lines."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        entries = (
+            OrderItem.objects.filter(order__status__in=SellerOrder.QUEUE_STATUSES)
+            .order_by()
+            .values_list(
+                "product__seller", "order", "order__status", "order__created_at"
+            )
+            .distinct()
+            .iterator(chunk_size=options["batch_size"])
+        )
+        with transaction.atomic():
+            SellerOrder.objects.all().delete()
+            total = 0
+            while batch := list(islice(entries, options["batch_size"])):
+                SellerOrder.objects.bulk_create(
+                    [
+                        SellerOrder(
+                            seller_id=seller_id,
+                            order_id=order_id,
+                            status=status,
+                            created_at=created_at,
+                        )
+                        for seller_id, order_id, status, created_at in batch
+                    ],
+                    ignore_conflicts=True,
+                )
+                total += len(batch)
+        self.stdout.write(self.style.SUCCESS(f"Queued {total} seller order(s)."))
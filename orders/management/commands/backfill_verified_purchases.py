@@ -0,0 +1,32 @@
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+
+from orders.models import Order, OrderItem, VerifiedPurchase
+
+
+class Command(BaseCommand):
+    help = "Fill the verified purchase table from existing delivered orders."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        pairs = (
+            OrderItem.objects.filter(order__status=Order.STATUS_DELIVERED)
+            .order_by()
+            .values_list("order__user", "product")
+            .distinct()
+            .iterator(chunk_size=options["batch_size"])
+        )
+        total = 0
+        while batch := list(islice(pairs, options["batch_size"])):
+            VerifiedPurchase.objects.bulk_create(
+                [
+                    VerifiedPurchase(user_id=user_id, product_id=product_id)
+                    for user_id, product_id in batch
+                ],
+                ignore_conflicts=True,
+            )
+            total += len(batch)
+        self.stdout.write(self.style.SUCCESS(f"Recorded {total} verified purchase(s)."))
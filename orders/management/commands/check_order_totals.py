@@ -0,0 +1,70 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db.models import Case, DecimalField, When
+from django.db.models.functions import Now
+
+from orders.models import Order
+from orders.services import line_total_sum
+
+CENT = Decimal("0.01")
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare every order's stored total_price with the sum of its lines, "
+        "in primary-key batches, and report or repair mismatches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="Overwrite mismatched totals with the aggregated value.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        last_pk = 0
+        checked = 0
+        mismatched = 0
+        while True:
+            rows = list(
+                Order.objects.filter(pk__gt=last_pk)
+                .order_by("pk")
+                .annotate(expected=line_total_sum())
+                .values_list("pk", "total_price", "expected")[:batch_size]
+            )
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+            checked += len(rows)
+
+            # Compare in Python: SQLite does decimal arithmetic in floating
+            # point, so an SQL-side comparison would report false drift.
+            drifted = {
+                pk: expected.quantize(CENT)
+                for pk, stored, expected in rows
+                if stored.quantize(CENT) != expected.quantize(CENT)
+            }
+            for pk, stored, expected in rows:
+                if pk in drifted:
+                    self.stdout.write(
+                        f"Order {pk}: stored={stored} expected={drifted[pk]}"
+                    )
+            mismatched += len(drifted)
+            if options["fix"] and drifted:
+                Order.objects.filter(pk__in=drifted).update(
+                    total_price=Case(
+                        *(When(pk=pk, then=total) for pk, total in drifted.items()),
+                        output_field=DecimalField(max_digits=12, decimal_places=2),
+                    ),
+                    updated_at=Now(),
+                )
+
+        summary = f"Checked {checked} order(s), {mismatched} mismatched."
+        if mismatched and not options["fix"]:
+            self.stdout.write(self.style.WARNING(summary))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
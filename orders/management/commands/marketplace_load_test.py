@@ -0,0 +1,252 @@
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client, override_settings
+
+from accounts.models import User
+from food_delivery.loadtest import latency_summary, revision
+from orders.management.commands.seed_marketplace import DISHES
+from products.models import Product
+
+ROUTES = {
+    "products-list": ("get", "/api/products/products/"),
+    "products-detail": ("get", "/api/products/products/{product}/"),
+    "products-search": ("get", "/api/products/products/?q={dish}"),
+    "reviews-list": ("get", "/api/reviews/reviews/"),
+    "orders-list": ("get", "/api/orders/orders/"),
+    "orders-create": ("post", "/api/orders/orders/"),
+    "token": ("post", "/api/accounts/token/"),
+}
+DEFAULT_MIX = (
+    "products-list=30,products-detail=20,products-search=10,reviews-list=10,"
+    "orders-list=15,orders-create=10,token=5"
+)
+TOKEN_PATH = ROUTES["token"][1]
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(","):
+        route, _, weight = part.partition("=")
+        route = route.strip()
+        if route not in ROUTES:
+            raise CommandError(
+                f"Unknown route {route!r}; choose from {', '.join(ROUTES)}."
+            )
+        try:
+            mix[route] = float(weight or 1)
+        except ValueError:
+            raise CommandError(f"Invalid weight for {route!r}: {weight!r}.")
+    if not any(mix.values()):
+        raise CommandError("The mix needs at least one positive weight.")
+    return mix
+
+
+class Worker:
+    """One client looping over the workload mix in its own thread."""
+
+    def __init__(self, username, password, host, product_ids, rng):
+        self.client = Client(SERVER_NAME=host)
+        self.credentials = {"username": username, "password": password}
+        self.product_ids = product_ids
+        self.rng = rng
+        self.samples = []
+
+    def login(self):
+        response = self.client.post(
+            TOKEN_PATH, self.credentials, content_type="application/json"
+        )
+        if response.status_code != 200:
+            raise CommandError(
+                f"Could not log in as {self.credentials['username']}: "
+                f"{response.status_code} {response.content[:200]!r}"
+            )
+        self.client.defaults["HTTP_AUTHORIZATION"] = (
+            f"Bearer {response.json()['access']}"
+        )
+
+    def request(self, route):
+        method, path = ROUTES[route]
+        path = path.format(
+            product=self.rng.choice(self.product_ids),
+            dish=self.rng.choice(DISHES).split()[0].lower(),
+        )
+        kwargs = {}
+        if route == "orders-create":
+            products = self.rng.sample(
+                self.product_ids, min(len(self.product_ids), self.rng.randint(1, 3))
+            )
+            kwargs["data"] = {
+                "items": [{"product_id": pk, "quantity": 1} for pk in products]
+            }
+        elif route == "token":
+            kwargs["data"] = self.credentials
+        started = time.perf_counter()
+        response = getattr(self.client, method)(
+            path, content_type="application/json", **kwargs
+        )
+        elapsed = (time.perf_counter() - started) * 1000
+        self.samples.append((route, response.status_code, elapsed))
+
+    def run(self, routes, weights, next_request, deadline):
+        try:
+            self.login()
+            while next_request() and time.perf_counter() < deadline:
+                self.request(self.rng.choices(routes, weights)[0])
+        finally:
+            connections.close_all()
+        return self.samples
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the API routes in-process from concurrent clients with a "
+        "weighted workload mix and report throughput and p50/p95/p99 latency "
+        "per route as JSON. Logs in as customers created by seed_marketplace."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument(
+            "--requests", type=int, default=2_000, help="Total requests to send."
+        )
+        parser.add_argument(
+            "--duration",
+            type=float,
+            help="Stop after this many seconds even if requests remain.",
+        )
+        parser.add_argument(
+            "--mix",
+            default=DEFAULT_MIX,
+            help="Comma-separated route=weight pairs; routes: "
+            + ", ".join(ROUTES)
+            + ".",
+        )
+        parser.add_argument("--prefix", default="seed")
+        parser.add_argument("--password", default="pass")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--host", default="localhost", help="Host header; must be allowed."
+        )
+        parser.add_argument(
+            "--throttle",
+            action="store_true",
+            help="Keep rate limits on; by default they are bypassed so the run "
+            "measures the handlers rather than 429s.",
+        )
+        parser.add_argument("--output", help="Also write the report to this file.")
+
+    def handle(self, *args, **options):
+        mix = parse_mix(options["mix"])
+        concurrency = options["concurrency"]
+        usernames = list(
+            User.objects.filter(
+                username__startswith=f"{options['prefix']}-user-",
+                role=User.ROLE_CUSTOMER,
+                is_active=True,
+            )
+            .order_by("pk")
+            .values_list("username", flat=True)[:concurrency]
+        )
+        if not usernames:
+            raise CommandError(
+                f"No customers prefixed {options['prefix']!r}; run seed_marketplace."
+            )
+        product_ids = list(
+            Product.objects.filter(stock__gt=0)
+            .order_by("-created_at", "-id")
+            .values_list("pk", flat=True)[:1_000]
+        )
+        if not product_ids:
+            raise CommandError("No products in stock; run seed_marketplace.")
+
+        workers = [
+            Worker(
+                usernames[i % len(usernames)],
+                options["password"],
+                options["host"],
+                product_ids,
+                random.Random(options["seed"] + i),
+            )
+            for i in range(concurrency)
+        ]
+        overrides = {}
+        if not options["throttle"]:
+            # Every add() succeeds on the dummy cache, so no window fills up.
+            overrides = {
+                "CACHES": {
+                    **settings.CACHES,
+                    "load-test-throttle": {
+                        "BACKEND": "django.core.cache.backends.dummy.DummyCache"
+                    },
+                },
+                "THROTTLE_CACHE_ALIAS": "load-test-throttle",
+            }
+        with override_settings(**overrides):
+            elapsed, samples = self.run(workers, mix, options)
+
+        report = self.report(samples, elapsed, concurrency, mix, options)
+        text = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                fh.write(text)
+        self.stdout.write(text)
+
+    def run(self, workers, mix, options):
+        routes, weights = zip(*mix.items())
+        remaining = count(options["requests"], -1)
+        lock = threading.Lock()
+
+        def next_request():
+            with lock:
+                return next(remaining) > 0
+
+        deadline = time.perf_counter() + (options["duration"] or float("inf"))
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(workers)) as pool:
+            futures = [
+                pool.submit(worker.run, routes, weights, next_request, deadline)
+                for worker in workers
+            ]
+            samples = [sample for future in futures for sample in future.result()]
+        return time.perf_counter() - started, samples
+
+    def report(self, samples, elapsed, concurrency, mix, options):
+        by_route = defaultdict(list)
+        for route, status, ms in samples:
+            by_route[route].append((status, ms))
+
+        routes = {}
+        for route in mix:
+            results = by_route.get(route, [])
+            statuses = defaultdict(int)
+            for status, _ in results:
+                statuses[str(status)] += 1
+            routes[route] = {
+                "requests": len(results),
+                "throughput_rps": round(len(results) / elapsed, 2),
+                "errors": sum(1 for status, _ in results if status >= 400),
+                "statuses": dict(sorted(statuses.items())),
+                "latency_ms": latency_summary([ms for _, ms in results]),
+            }
+        return {
+            "revision": revision(),
+            "database": connections["default"].vendor,
+            "concurrency": concurrency,
+            "mix": mix,
+            "throttled": options["throttle"],
+            "seconds": round(elapsed, 3),
+            "requests": len(samples),
+            "throughput_rps": round(len(samples) / elapsed, 2),
+            "errors": sum(1 for _, status, _ in samples if status >= 400),
+            "latency_ms": latency_summary([ms for _, _, ms in samples]),
+            "routes": routes,
+        }
@@ -0,0 +1,144 @@
+import asyncio
+import json
+import resource
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.serializers import CustomTokenObtainPairSerializer
+from food_delivery.asgi import application
+from food_delivery.loadtest import percentile
+from orders.events import get_broker, order_channel, status_event
+from orders.models import Order
+
+
+class Watcher:
+    """One SSE client driven straight through the ASGI application."""
+
+    def __init__(self, path, host, token, disconnect):
+        self.scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [
+                (b"host", host.encode()),
+                (b"authorization", f"Bearer {token}".encode()),
+            ],
+            "client": ("127.0.0.1", 0),
+            "server": (host, 80),
+        }
+        self.disconnect = disconnect
+        self.requested = False
+        self.status = None
+        self.events = 0
+        self.received_at = None
+
+    async def receive(self):
+        if not self.requested:
+            self.requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await self.disconnect.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            self.status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunk = message.get("body", b"")
+            if chunk.startswith(b"event:"):
+                self.events += 1
+                if self.events == 2:
+                    self.received_at = time.perf_counter()
+
+    async def run(self):
+        await application(self.scope, self.receive, self.send)
+
+
+class Command(BaseCommand):
+    help = (
+        "Hold many concurrent status streams for one order in this process, "
+        "publish one event to all of them and report the fan-out as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--order", type=int, required=True)
+        parser.add_argument("--watchers", type=int, default=1000)
+        parser.add_argument(
+            "--host", default="localhost", help="Host header; must be allowed."
+        )
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=60.0,
+            help="Seconds to wait for the watchers to connect and to receive.",
+        )
+        parser.add_argument("--output", help="Also write the report to this file.")
+
+    def handle(self, *args, **options):
+        try:
+            order = Order.objects.select_related("user").get(pk=options["order"])
+        except Order.DoesNotExist:
+            raise CommandError(f"Order {options['order']} does not exist.")
+        report = asyncio.run(
+            self.run(order, options["watchers"], options["host"], options["timeout"])
+        )
+        text = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                fh.write(text)
+        self.stdout.write(text)
+
+    async def wait_for(self, condition, timeout):
+        deadline = time.perf_counter() + timeout
+        while not condition() and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+        return condition()
+
+    async def run(self, order, count, host, timeout):
+        broker = get_broker()
+        channel = order_channel(order.pk)
+        token = str(CustomTokenObtainPairSerializer.get_token(order.user).access_token)
+        path = f"/api/orders/orders/{order.pk}/events/"
+        disconnect = asyncio.Event()
+        watchers = [Watcher(path, host, token, disconnect) for _ in range(count)]
+
+        started = time.perf_counter()
+        tasks = [asyncio.create_task(watcher.run()) for watcher in watchers]
+        await self.wait_for(lambda: broker.subscriber_count(channel) >= count, timeout)
+        connect_seconds = time.perf_counter() - started
+        connected = broker.subscriber_count(channel)
+
+        published = time.perf_counter()
+        broker.publish(channel, status_event(order))
+        await self.wait_for(
+            lambda: all(watcher.received_at for watcher in watchers), timeout
+        )
+        latencies = [
+            round((watcher.received_at - published) * 1000, 2)
+            for watcher in watchers
+            if watcher.received_at
+        ]
+
+        disconnect.set()
+        await asyncio.wait(tasks, timeout=timeout)
+        return {
+            "watchers": count,
+            "connected": connected,
+            "connect_seconds": round(connect_seconds, 3),
+            "delivered": len(latencies),
+            "delivery_ms": {
+                "p50": percentile(latencies, 50),
+                "p99": percentile(latencies, 99),
+                "max": max(latencies, default=None),
+            },
+            "max_rss_mb": round(
+                resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+            ),
+            "left_subscribed": broker.subscriber_count(channel),
+        }
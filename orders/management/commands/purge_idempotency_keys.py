@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from orders.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = "Delete stored Idempotency-Key responses past their expiry."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        total = 0
+        expired = IdempotencyKey.objects.filter(expires_at__lte=now)
+        # Small batches keep each DELETE's locks short next to live writes.
+        while batch := list(
+            expired.order_by("expires_at").values_list("pk", flat=True)[
+                : options["batch_size"]
+            ]
+        ):
+            deleted, _ = IdempotencyKey.objects.filter(pk__in=batch).delete()
+            total += deleted
+        self.stdout.write(self.style.SUCCESS(f"Purged {total} idempotency key(s)."))
@@ -0,0 +1,48 @@
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from orders.models import SellerDailySales
+from orders.rollups import sales_rows
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the seller daily sales rollup from the order lines, one "
+        "chunk of products at a time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=1000, help="Products per chunk."
+        )
+
+    def handle(self, *args, **options):
+        product_ids = (
+            Product.objects.order_by("pk")
+            .values_list("pk", flat=True)
+            .iterator(chunk_size=options["batch_size"])
+        )
+        products = rows = 0
+        while batch := list(islice(product_ids, options["batch_size"])):
+            with transaction.atomic():
+                # Order line changes lock their product rows, so holding the
+                # chunk's rows keeps live updates out until it is swapped in.
+                list(
+                    Product.objects.select_for_update()
+                    .filter(pk__in=batch)
+                    .values_list("pk", flat=True)
+                )
+                SellerDailySales.objects.filter(product__in=batch).delete()
+                created = SellerDailySales.objects.bulk_create(
+                    sales_rows(batch), batch_size=options["batch_size"]
+                )
+            products += len(batch)
+            rows += len(created)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt {rows} daily sales row(s) for {products} product(s)."
+            )
+        )
@@ -0,0 +1,114 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from orders.models import Order, OrderItem
+from products.cache import bump_version
+from products.models import Product
+
+
+def committed_quantities(product_ids=None):
+    qs = OrderItem.objects.exclude(order__status=Order.STATUS_CANCELED)
+    if product_ids is not None:
+        qs = qs.filter(product__in=product_ids)
+    return dict(
+        qs.order_by()
+        .values("product")
+        .annotate(quantity=Sum("quantity"))
+        .values_list("product", "quantity")
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare each product's reserved counter with the quantities held by "
+        "non-canceled orders and report or repair the drift."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="Move drifted units back into (or out of) stock.",
+        )
+        parser.add_argument(
+            "--keep-stock",
+            action="store_true",
+            help="With --fix, only reset the reserved counter and leave stock "
+            "as is (use once when reserved was never tracked).",
+        )
+
+    def handle(self, *args, **options):
+        committed = committed_quantities()
+        drifted = [
+            pk
+            for pk, reserved in Product.objects.values_list("pk", "reserved")
+            .order_by("pk")
+            .iterator()
+            if reserved != committed.get(pk, 0)
+        ]
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS("No stock drift found."))
+            return
+
+        with transaction.atomic():
+            products = list(
+                Product.objects.select_for_update()
+                .filter(pk__in=drifted)
+                .order_by("pk")
+            )
+            # Re-read under the row locks so orders placed since the first
+            # pass are not mistaken for drift.
+            committed = committed_quantities(drifted)
+            changed = []
+            skipped = []
+            for product in products:
+                expected = committed.get(product.pk, 0)
+                drift = product.reserved - expected
+                if not drift:
+                    continue
+                self.stdout.write(
+                    f"Product {product.pk} '{product.name}': stock={product.stock} "
+                    f"reserved={product.reserved} committed={expected} "
+                    f"drift={drift}"
+                )
+                if options["fix"]:
+                    if not options["keep_stock"]:
+                        if product.stock + drift < 0:
+                            # Clamping would break stock + reserved, the sum
+                            # this command exists to restore; leave it for a
+                            # person to look at.
+                            skipped.append(product)
+                            self.stdout.write(
+                                self.style.WARNING(
+                                    f"Skipped product {product.pk}: stock would "
+                                    f"go negative ({product.stock + drift})."
+                                )
+                            )
+                            continue
+                        product.stock += drift
+                    product.reserved = expected
+                    product.updated_at = timezone.now()
+                    changed.append(product)
+            Product.objects.bulk_update(changed, ["stock", "reserved", "updated_at"])
+            if changed:
+                bump_version(Product)
+
+        if options["fix"]:
+            self.stdout.write(
+                self.style.SUCCESS(f"Repaired {len(changed)} product(s).")
+            )
+            if skipped:
+                self.stdout.write(
+                    self.style.WARNING(
+                        f"Skipped {len(skipped)} product(s) whose stock would "
+                        "go negative."
+                    )
+                )
+        else:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"{len(drifted)} product(s) drifted; rerun with --fix to repair."
+                )
+            )
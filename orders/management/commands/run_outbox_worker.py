@@ -0,0 +1,161 @@
+import json
+import signal
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from food_delivery.metrics import CONTENT_TYPE, exposition
+from orders import outbox
+from orders.models import OutboxEvent
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = exposition(outbox.HISTOGRAMS).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Run order side effects from the outbox: claim due events, run their "
+        "handlers on a thread pool, retry failures with backoff and mark "
+        "events dead after --max-attempts. Prints throughput and lag as JSON "
+        "lines."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="Handler threads.")
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=0.5,
+            help="Seconds to sleep when no event is due.",
+        )
+        parser.add_argument(
+            "--lease",
+            type=float,
+            default=60.0,
+            help="Seconds before a claimed event is handed to another worker.",
+        )
+        parser.add_argument("--max-attempts", type=int, default=8)
+        parser.add_argument(
+            "--backoff", type=float, default=1.0, help="First retry delay (s)."
+        )
+        parser.add_argument("--max-backoff", type=float, default=600.0)
+        parser.add_argument(
+            "--stats-interval",
+            type=float,
+            default=30.0,
+            help="Seconds between stats lines.",
+        )
+        parser.add_argument(
+            "--metrics-port",
+            type=int,
+            help="Serve the handler histograms in the Prometheus format here.",
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="Exit once no event is due."
+        )
+        parser.add_argument(
+            "--requeue-dead",
+            action="store_true",
+            help="Move dead events back to pending with fresh attempts and exit.",
+        )
+
+    def handle(self, *args, **options):
+        if options["requeue_dead"]:
+            count = OutboxEvent.objects.filter(status=OutboxEvent.STATUS_DEAD).update(
+                status=OutboxEvent.STATUS_PENDING,
+                attempts=0,
+                available_at=timezone.now(),
+            )
+            self.stdout.write(self.style.SUCCESS(f"Requeued {count} dead event(s)."))
+            return
+
+        if options["metrics_port"]:
+            server = ThreadingHTTPServer(
+                ("0.0.0.0", options["metrics_port"]), MetricsHandler
+            )
+            Thread(target=server.serve_forever, daemon=True).start()
+
+        self.stopping = False
+        if not options["once"]:
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signum, self.stop)
+
+        pool = None
+        if options["workers"] > 1:
+            pool = ThreadPoolExecutor(
+                max_workers=options["workers"], thread_name_prefix="outbox"
+            )
+        worker = outbox.Worker(
+            batch_size=options["batch_size"],
+            max_attempts=options["max_attempts"],
+            lease=options["lease"],
+            backoff=options["backoff"],
+            max_backoff=options["max_backoff"],
+            pool=pool,
+        )
+        try:
+            self.run(worker, options)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+    def stop(self, signum, frame):
+        # Finish the batch in hand so no event waits out its lease.
+        self.stopping = True
+
+    def run(self, worker, options):
+        totals = Counter()
+        window = Counter()
+        window_started = time.perf_counter()
+        while not self.stopping:
+            outcomes = worker.run_once()
+            totals.update(outcomes)
+            window.update(outcomes)
+            elapsed = time.perf_counter() - window_started
+            if elapsed >= options["stats_interval"]:
+                self.report(window, elapsed)
+                window = Counter()
+                window_started = time.perf_counter()
+            if not outcomes:
+                if options["once"]:
+                    break
+                time.sleep(options["poll_interval"])
+        self.report(totals, None)
+
+    def report(self, outcomes, elapsed):
+        now = timezone.now()
+        backlog = OutboxEvent.objects.filter(
+            status=OutboxEvent.STATUS_PENDING, available_at__lte=now
+        ).aggregate(due=Count("pk"), oldest=Min("created_at"))
+        stats = {
+            "processed": sum(outcomes.values()),
+            "done": outcomes[outbox.OUTCOME_DONE],
+            "retried": outcomes[outbox.OUTCOME_RETRY],
+            "dead": outcomes[outbox.OUTCOME_DEAD],
+            "due": backlog["due"],
+            "lag_seconds": (
+                round((now - backlog["oldest"]).total_seconds(), 3)
+                if backlog["oldest"]
+                else 0
+            ),
+        }
+        if elapsed is not None:
+            stats["events_per_second"] = round(stats["processed"] / elapsed, 2)
+        self.stdout.write(json.dumps(stats))
@@ -0,0 +1,291 @@
+import random
+import time
+from bisect import bisect_left
+from decimal import Decimal
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from accounts.models import User
+from orders.models import Order, OrderItem, VerifiedPurchase
+from products.cache import bump_version
+from products.models import Category, Product
+from reviews.models import Review
+
+ADJECTIVES = [
+    "Spicy", "Smoky", "Crispy", "Classic", "Vegan", "Garlic", "Golden",
+    "Double", "Fresh", "Grilled", "Honey", "Loaded", "Mini", "Roasted",
+]  # fmt: skip
+DISHES = [
+    "Pizza", "Burger", "Ramen", "Taco", "Burrito", "Salad", "Curry", "Dumplings",
+    "Pho", "Falafel", "Noodles", "Sushi Roll", "Wrap", "Kebab", "Pancakes",
+]  # fmt: skip
+STATUS_WEIGHTS = {
+    Order.STATUS_PENDING: 5,
+    Order.STATUS_PROCESSING: 5,
+    Order.STATUS_SHIPPED: 10,
+    Order.STATUS_DELIVERED: 70,
+    Order.STATUS_CANCELED: 10,
+}
+RATING_WEIGHTS = [4, 6, 15, 35, 40]
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with a synthetic marketplace for load testing: "
+        "users, categories, products, orders whose lines follow a skewed "
+        "product popularity, verified purchases and reviews. The same seed "
+        "on an empty database always produces the same data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100_000)
+        parser.add_argument(
+            "--sellers", type=int, default=1_000, help="How many of --users sell."
+        )
+        parser.add_argument("--categories", type=int, default=50)
+        parser.add_argument("--products", type=int, default=1_000_000)
+        parser.add_argument(
+            "--items", type=int, default=10_000_000, help="Order lines to create."
+        )
+        parser.add_argument("--max-items-per-order", type=int, default=5)
+        parser.add_argument(
+            "--skew",
+            type=float,
+            default=1.1,
+            help="Zipf exponent of product popularity; 0 is uniform.",
+        )
+        parser.add_argument(
+            "--review-rate",
+            type=float,
+            default=0.1,
+            help="Share of verified purchases that get a review.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--prefix", default="seed", help="Username and slug prefix."
+        )
+        parser.add_argument(
+            "--password", default="pass", help="Password of every seeded user."
+        )
+        parser.add_argument("--batch-size", type=int, default=5_000)
+
+    def handle(self, *args, **options):
+        if not 0 < options["sellers"] < options["users"]:
+            raise CommandError("--sellers must be between 0 and --users.")
+        if options["categories"] < 1 or options["products"] < 1:
+            raise CommandError("--categories and --products must be positive.")
+        prefix = options["prefix"]
+        if User.objects.filter(username=f"{prefix}-user-0").exists():
+            raise CommandError(
+                f"Users prefixed {prefix!r} already exist; pick another --prefix."
+            )
+
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        self.prefix = prefix
+        started = time.perf_counter()
+
+        seller_ids, customer_ids = self.seed_users(
+            options["users"], options["sellers"], options["password"]
+        )
+        category_ids = self.seed_categories(options["categories"])
+        product_ids, prices = self.seed_products(
+            options["products"], seller_ids, category_ids
+        )
+        orders, reserved = self.seed_orders(
+            options["items"],
+            options["max_items_per_order"],
+            options["skew"],
+            customer_ids,
+            product_ids,
+            prices,
+        )
+        self.reserve_stock(product_ids, reserved)
+        call_command(
+            "backfill_verified_purchases",
+            batch_size=self.batch_size,
+            stdout=self.stdout,
+        )
+        reviews = self.seed_reviews(options["review_rate"])
+        call_command("rebuild_ratings", batch_size=self.batch_size, stdout=self.stdout)
+        call_command("rebuild_search_index", stdout=self.stdout)
+        call_command(
+            "rebuild_sales_rollup", batch_size=self.batch_size, stdout=self.stdout
+        )
+        call_command(
+            "backfill_seller_queue", batch_size=self.batch_size, stdout=self.stdout
+        )
+        bump_version(Category)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Seeded {len(seller_ids) + len(customer_ids)} users, "
+                f"{len(category_ids)} categories, {len(product_ids)} products, "
+                f"{orders} orders with {options['items']} lines and {reviews} "
+                f"reviews in {time.perf_counter() - started:.1f}s."
+            )
+        )
+
+    def seed_users(self, count, sellers, password):
+        # Hashing is deliberately slow; every seeded user shares one hash.
+        password = make_password(password)
+        users = (
+            User(
+                username=f"{self.prefix}-user-{i}",
+                email=f"{self.prefix}-user-{i}@example.com",
+                password=password,
+                role=User.ROLE_SELLER if i < sellers else User.ROLE_CUSTOMER,
+            )
+            for i in range(count)
+        )
+        ids = []
+        for batch in batches(users, self.batch_size):
+            ids.extend(user.pk for user in User.objects.bulk_create(batch))
+        self.stdout.write(f"Created {len(ids)} users.")
+        return ids[:sellers], ids[sellers:]
+
+    def seed_categories(self, count):
+        categories = Category.objects.bulk_create(
+            [
+                Category(
+                    name=f"{self.prefix.title()} category {i}",
+                    slug=f"{self.prefix}-category-{i}",
+                )
+                for i in range(count)
+            ],
+            batch_size=self.batch_size,
+        )
+        return [category.pk for category in categories]
+
+    def seed_products(self, count, seller_ids, category_ids):
+        rng = self.rng
+        prices = [Decimal(rng.randint(150, 4_000)).scaleb(-2) for _ in range(count)]
+        products = (
+            Product(
+                seller_id=rng.choice(seller_ids),
+                category_id=rng.choice(category_ids),
+                name=f"{rng.choice(ADJECTIVES)} {rng.choice(DISHES)} {i}",
+                description=f"Seeded item {i}.",
+                price=prices[i],
+                stock=rng.randint(50, 1_000),
+            )
+            for i in range(count)
+        )
+        ids = []
+        for batch in batches(products, self.batch_size):
+            ids.extend(product.pk for product in Product.objects.bulk_create(batch))
+        self.stdout.write(f"Created {len(ids)} products.")
+        return ids, prices
+
+    def popularity(self, count, skew):
+        """
+        A sampler of product indexes under a Zipf distribution, with ranks
+        shuffled so the best sellers are spread over sellers and categories.
+        """
+        ranked = list(range(count))
+        self.rng.shuffle(ranked)
+        cum_weights = list(accumulate(1 / rank**skew for rank in range(1, count + 1)))
+        total = cum_weights[-1]
+
+        def sample():
+            return ranked[
+                min(bisect_left(cum_weights, self.rng.random() * total), count - 1)
+            ]
+
+        return sample
+
+    def seed_orders(self, items, max_lines, skew, customer_ids, product_ids, prices):
+        rng = self.rng
+        sample = self.popularity(len(product_ids), skew)
+        statuses, weights = zip(*STATUS_WEIGHTS.items())
+        max_lines = min(max_lines, len(product_ids))
+        reserved = [0] * len(product_ids)
+        created = orders = 0
+
+        while created < items:
+            batch = []
+            while created < items and len(batch) < self.batch_size:
+                wanted = min(rng.randint(1, max_lines), items - created)
+                picked = []
+                while len(picked) < wanted:
+                    index = sample()
+                    if index not in picked:
+                        picked.append(index)
+                status = rng.choices(statuses, weights)[0]
+                lines = [(index, rng.randint(1, 3)) for index in picked]
+                if status != Order.STATUS_CANCELED:
+                    for index, quantity in lines:
+                        reserved[index] += quantity
+                order = Order(
+                    user_id=rng.choice(customer_ids),
+                    status=status,
+                    total_price=sum(prices[index] * qty for index, qty in lines),
+                )
+                batch.append((order, lines))
+                created += len(lines)
+
+            with transaction.atomic():
+                Order.objects.bulk_create([order for order, _ in batch])
+                OrderItem.objects.bulk_create(
+                    [
+                        OrderItem(
+                            order_id=order.pk,
+                            product_id=product_ids[index],
+                            quantity=quantity,
+                            price=prices[index],
+                        )
+                        for order, lines in batch
+                        for index, quantity in lines
+                    ],
+                    batch_size=self.batch_size,
+                )
+            orders += len(batch)
+            self.stdout.write(f"Created {orders} orders, {created} lines...")
+        return orders, reserved
+
+    def reserve_stock(self, product_ids, reserved):
+        # Seeded orders bypass the order services, so the reserved counters
+        # are written here to match their lines.
+        products = (
+            Product(pk=pk, reserved=units)
+            for pk, units in zip(product_ids, reserved)
+            if units
+        )
+        for batch in batches(products, self.batch_size):
+            Product.objects.bulk_update(batch, ["reserved"])
+
+    def seed_reviews(self, rate):
+        purchases = (
+            VerifiedPurchase.objects.filter(
+                user__username__startswith=f"{self.prefix}-user-"
+            )
+            .order_by("user", "product")
+            .values_list("user", "product")
+            .iterator(chunk_size=self.batch_size)
+        )
+        reviews = (
+            Review(
+                user_id=user_id,
+                product_id=product_id,
+                rating=self.rng.choices(range(1, 6), RATING_WEIGHTS)[0],
+                comment="Seeded review.",
+            )
+            for user_id, product_id in purchases
+            if self.rng.random() < rate
+        )
+        total = 0
+        for batch in batches(reviews, self.batch_size):
+            Review.objects.bulk_create(batch, ignore_conflicts=True)
+            total += len(batch)
+        self.stdout.write(f"Created {total} reviews.")
+        return total
@@ -24,10 +24,23 @@ class Order(models.Model):
         max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     total_price = models.DecimalField(max_digits=12, decimal_places=2, default=0)
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="order_created_idx"),
+            models.Index(
+                fields=["user", "-created_at", "-id"], name="order_user_created_idx"
+            ),
+            models.Index(fields=["user", "status"], name="order_user_status_idx"),
+            models.Index(
+                fields=["created_at"],
+                condition=models.Q(status="pending"),
+                name="order_pending_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"Order #{self.pk} - {self.user} - {self.status}"
@@ -41,9 +54,190 @@ class OrderItem(models.Model):
     quantity = models.PositiveIntegerField(validators=[MinValueValidator(1)])
     price = models.DecimalField(max_digits=10, decimal_places=2)
 
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(
+                fields=["product", "order"], name="orderitem_product_order_idx"
+            ),
+        ]
+
     def __str__(self):
         return f"{self.product.name} x{self.quantity}"
 
     @property
     def line_total(self):
         return self.price * self.quantity
+
+
+class SellerOrder(models.Model):
+    """
+    One row per seller with a line in an open (pending or processing) order.
+
+    A seller's work queue is a single range scan of the
+    ``(seller, status, created_at)`` index instead of a join from order
+    lines through products. ``status`` and ``created_at`` copy the order's;
+    ``orders.queue`` keeps the rows in step and deletes them once the order
+    ships or is canceled, so the table only grows with open work.
+    """
+
+    QUEUE_STATUSES = (Order.STATUS_PENDING, Order.STATUS_PROCESSING)
+
+    pk = models.CompositePrimaryKey("seller", "order")
+    seller = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="order_queue"
+    )
+    order = models.ForeignKey(
+        Order, on_delete=models.CASCADE, related_name="seller_entries"
+    )
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["seller", "status", "created_at", "order"],
+                name="sellerorder_queue_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Order #{self.order_id} for seller {self.seller_id} ({self.status})"
+
+
+class VerifiedPurchase(models.Model):
+    """
+    One row per (user, product) with at least one delivered order line.
+
+    Filled when an order is delivered so the review gate is a primary-key
+    lookup instead of a join over the customer's order history.
+    """
+
+    pk = models.CompositePrimaryKey("user", "product")
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="verified_purchases"
+    )
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="verified_purchases"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.user} bought {self.product}"
+
+    @classmethod
+    def record(cls, order):
+        """Mark every product on ``order`` as purchased by its customer."""
+        product_ids = order.items.order_by().values_list("product", flat=True)
+        cls.objects.bulk_create(
+            [
+                cls(user_id=order.user_id, product_id=product_id)
+                for product_id in set(product_ids)
+            ],
+            ignore_conflicts=True,
+        )
+
+
+class SellerDailySales(models.Model):
+    """
+    Units, revenue and order count per seller, product and day.
+
+    Kept in step with order lines by ``orders.rollups.record_sales`` in the
+    same transaction as the line change; canceled orders are taken back
+    out. ``day`` is the order's creation date in the current time zone.
+    """
+
+    pk = models.CompositePrimaryKey("seller", "product", "day")
+    seller = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="daily_sales"
+    )
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="daily_sales"
+    )
+    day = models.DateField()
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    orders = models.IntegerField(
+        default=0, help_text="Orders with at least one line of the product."
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["seller", "day"], name="sales_seller_day_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.product} on {self.day}: {self.units} unit(s)"
+
+
+class OutboxEvent(models.Model):
+    """
+    A side effect of an order change, waiting for its handler.
+
+    Written in the same transaction as the change, one row per registered
+    handler, and run later by ``run_outbox_worker``; see ``orders.outbox``.
+    Handled rows are deleted. Rows that keep failing end up ``dead`` with
+    their last error, for inspection and ``--requeue-dead``.
+    """
+
+    STATUS_PENDING = "pending"
+    STATUS_DEAD = "dead"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_DEAD, "Dead"),
+    ]
+    topic = models.CharField(max_length=100)
+    handler = models.CharField(max_length=200)
+    payload = models.JSONField()
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(
+        help_text="Not claimed before this time: the retry backoff or the "
+        "lease of the worker running it."
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["available_at", "id"],
+                condition=models.Q(status="pending"),
+                name="outbox_pending_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.handler} for {self.topic} ({self.status})"
+
+
+class IdempotencyKey(models.Model):
+    """
+    The response to a write sent with an ``Idempotency-Key`` header.
+
+    Keyed by user and key; ``fingerprint`` hashes the method, path and body
+    so a key reused for a different request is refused rather than
+    replayed. Rows count as absent once ``expires_at`` passes and are
+    overwritten on reuse or removed by ``purge_idempotency_keys``; see
+    ``orders.idempotency``.
+    """
+
+    pk = models.CompositePrimaryKey("user", "key")
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="idempotency_keys"
+    )
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField()
+    response = models.JSONField()
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["expires_at"], name="idempotency_expiry_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.key} for {self.user_id} ({self.status_code})"
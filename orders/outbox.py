@@ -0,0 +1,182 @@
+"""
+Transactional outbox for order side effects.
+
+Writers call ``emit`` inside the transaction that changes an order. It
+inserts one ``OutboxEvent`` per handler registered for the topic in a single
+query, so a write costs the same however many consumers subscribe, and a
+rolled-back change announces nothing. ``Worker`` claims due rows with
+``SELECT ... FOR UPDATE SKIP LOCKED``, leases them by moving
+``available_at`` forward, and runs each handler in its own transaction. A
+handler that raises is retried with exponential backoff until
+``max_attempts``, then its row is marked dead; handled rows are deleted in
+one query per batch. Handlers must be idempotent: rows held by a worker
+that dies are claimed again once the lease runs out.
+"""
+
+import random
+import time
+import traceback
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from food_delivery.metrics import DURATION_BUCKETS, Histogram
+from orders.models import OutboxEvent
+
+HANDLERS = {}
+SUBSCRIBERS = defaultdict(list)
+
+OUTCOME_DONE = "done"
+OUTCOME_RETRY = "retry"
+OUTCOME_DEAD = "dead"
+
+LAG_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+EVENT_LAG = Histogram(
+    "outbox_event_lag_seconds",
+    "Time from an outbox event's creation to its handler finishing.",
+    LAG_BUCKETS,
+    labelnames=("handler", "outcome"),
+)
+HANDLER_SECONDS = Histogram(
+    "outbox_handler_duration_seconds",
+    "Run time of one outbox handler attempt.",
+    DURATION_BUCKETS,
+    labelnames=("handler", "outcome"),
+)
+HISTOGRAMS = (EVENT_LAG, HANDLER_SECONDS)
+
+
+def handler(topic):
+    """Register the decorated function to run for every ``topic`` event."""
+
+    def register(func):
+        name = f"{func.__module__}.{func.__qualname__}"
+        HANDLERS[name] = func
+        if name not in SUBSCRIBERS[topic]:
+            SUBSCRIBERS[topic].append(name)
+        return func
+
+    return register
+
+
+def emit(topic, payload):
+    """Queue ``payload`` (JSON-serializable) for every handler of ``topic``."""
+    now = timezone.now()
+    OutboxEvent.objects.bulk_create(
+        [
+            OutboxEvent(topic=topic, handler=name, payload=payload, available_at=now)
+            for name in SUBSCRIBERS.get(topic, ())
+        ]
+    )
+
+
+class Worker:
+    def __init__(
+        self,
+        batch_size=100,
+        max_attempts=8,
+        lease=60.0,
+        backoff=1.0,
+        max_backoff=600.0,
+        pool=None,
+    ):
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.lease = lease
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.pool = pool
+
+    def claim(self):
+        """Lease up to ``batch_size`` due events that no other worker holds."""
+        now = timezone.now()
+        with transaction.atomic():
+            ids = list(
+                OutboxEvent.objects.select_for_update(skip_locked=True)
+                .filter(status=OutboxEvent.STATUS_PENDING, available_at__lte=now)
+                .order_by("available_at", "id")
+                .values_list("pk", flat=True)[: self.batch_size]
+            )
+            if not ids:
+                return []
+            OutboxEvent.objects.filter(pk__in=ids).update(
+                available_at=now + timedelta(seconds=self.lease),
+                attempts=F("attempts") + 1,
+            )
+            return list(OutboxEvent.objects.filter(pk__in=ids).order_by("id"))
+
+    def retry_delay(self, attempts):
+        delay = min(self.backoff * 2 ** (attempts - 1), self.max_backoff)
+        return delay * random.uniform(0.5, 1.5)
+
+    def handle(self, event):
+        """
+        Run ``event``'s handler in its own transaction; returns the exception
+        it raised, or ``None``, and how long it took.
+        """
+        started = time.perf_counter()
+        try:
+            func = HANDLERS.get(event.handler)
+            if func is None:
+                raise LookupError(f"No outbox handler named {event.handler!r}.")
+            with transaction.atomic():
+                func(event.payload)
+        except Exception as exc:
+            return exc, time.perf_counter() - started
+        return None, time.perf_counter() - started
+
+    def settle(self, events, results):
+        """Delete the handled rows in one query and reschedule the rest."""
+        OutboxEvent.objects.filter(
+            pk__in=[event.pk for event, (exc, _) in zip(events, results) if exc is None]
+        ).delete()
+        now = timezone.now()
+        outcomes = Counter()
+        for event, (exc, seconds) in zip(events, results):
+            outcome = OUTCOME_DONE if exc is None else self.fail(event, exc)
+            labels = (event.handler, outcome)
+            HANDLER_SECONDS.observe(labels, seconds)
+            EVENT_LAG.observe(labels, (now - event.created_at).total_seconds())
+            outcomes[outcome] += 1
+        return outcomes
+
+    def fail(self, event, exc):
+        error = "".join(traceback.format_exception(exc))
+        if event.attempts >= self.max_attempts:
+            OutboxEvent.objects.filter(pk=event.pk).update(
+                status=OutboxEvent.STATUS_DEAD, last_error=error
+            )
+            return OUTCOME_DEAD
+        OutboxEvent.objects.filter(pk=event.pk).update(
+            available_at=timezone.now()
+            + timedelta(seconds=self.retry_delay(event.attempts)),
+            last_error=error,
+        )
+        return OUTCOME_RETRY
+
+    def handle_in_thread(self, event):
+        # Pool threads keep their connections between batches; drop any the
+        # database closed or CONN_MAX_AGE retired, as a request would.
+        close_old_connections()
+        return self.handle(event)
+
+    def run_once(self):
+        """Claim and run one batch; returns a Counter of outcomes."""
+        events = self.claim()
+        if not events:
+            return Counter()
+        if self.pool is None:
+            results = [self.handle(event) for event in events]
+        else:
+            results = list(self.pool.map(self.handle_in_thread, events))
+        return self.settle(events, results)
+
+    def drain(self):
+        """Run batches until no event is due."""
+        outcomes = Counter()
+        while batch := self.run_once():
+            outcomes.update(batch)
+        return outcomes
@@ -5,7 +5,9 @@ class IsOwnerOrAdmin(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.user and request.user.is_staff:
             return True
-        return getattr(obj, "user", None) == request.user
+        # Orders may arrive as values() rows from the fast read path.
+        owner_id = obj.get("user") if isinstance(obj, dict) else obj.user_id
+        return owner_id == request.user.pk
 
 
 class IsSeller(permissions.BasePermission):
@@ -0,0 +1,52 @@
+"""
+Seller work queues.
+
+``SellerOrder`` lists, per seller, the open orders holding their products.
+Rows are added when an order is placed, re-synced when lines are added or
+removed, and follow the order's status until it leaves the queue. Call
+these inside the transaction that changes the order.
+"""
+
+from orders.models import SellerOrder
+
+
+def enqueue(order, seller_ids):
+    """Add ``order`` to the queues of ``seller_ids``."""
+    if order.status not in SellerOrder.QUEUE_STATUSES:
+        return
+    SellerOrder.objects.bulk_create(
+        [
+            SellerOrder(
+                seller_id=seller_id,
+                order=order,
+                status=order.status,
+                created_at=order.created_at,
+            )
+            for seller_id in seller_ids
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def sync_sellers(order):
+    """Match ``order``'s queue rows to the sellers of its current lines."""
+    sellers = set(order.items.order_by().values_list("product__seller", flat=True))
+    SellerOrder.objects.filter(order=order).exclude(seller__in=sellers).delete()
+    enqueue(order, sellers)
+
+
+def move_sellers(order, before, after):
+    """Move ``order``'s queue rows from the ``before`` to the ``after`` sellers."""
+    if gone := before - after:
+        SellerOrder.objects.filter(order=order, seller__in=gone).delete()
+    if added := after - before:
+        enqueue(order, added)
+
+
+def sync_status(order):
+    """Carry ``order.status`` to its queue rows, or drop them once it ships."""
+    rows = SellerOrder.objects.filter(order=order)
+    if order.status in SellerOrder.QUEUE_STATUSES:
+        rows.update(status=order.status)
+    else:
+        rows.delete()
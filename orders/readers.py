@@ -0,0 +1,70 @@
+from collections import defaultdict
+
+from food_delivery.readers import RowSerializer, datetime_str, decimal_str
+from orders.models import OrderItem
+
+ITEM_FIELDS = (
+    "id",
+    "order",
+    "product",
+    "product__name",
+    "product__category__name",
+    "product__seller__username",
+    "quantity",
+    "price",
+)
+
+
+def item_rows(order_ids, seller=None):
+    """
+    Response dicts for the lines of ``order_ids``, grouped by order; only
+    ``seller``'s lines when given.
+    """
+    items = defaultdict(list)
+    rows = OrderItem.objects.filter(order__in=order_ids)
+    if seller is not None:
+        rows = rows.filter(product__seller=seller)
+    rows = rows.order_by("id").values_list(*ITEM_FIELDS)
+    for pk, order, product, name, category, seller, quantity, price in rows:
+        items[order].append(
+            {
+                "id": pk,
+                "product": product,
+                "product_name": name,
+                "category": category,
+                "seller": seller,
+                "quantity": quantity,
+                "price": decimal_str(price),
+                "line_total": price * quantity,
+            }
+        )
+    return items
+
+
+class OrderRowSerializer(RowSerializer):
+    """Fast path for ``OrderSerializer``: one query per page for all lines."""
+
+    fields = ("id", "user", "status", "total_price", "created_at")
+
+    def to_representation_many(self, rows):
+        items = item_rows([row["id"] for row in rows])
+        return [self.to_representation(row, items[row["id"]]) for row in rows]
+
+    def to_representation(self, row, items=()):
+        return {
+            "id": row["id"],
+            "user": row["user"],
+            "status": row["status"],
+            "total_price": decimal_str(row["total_price"]),
+            "created_at": datetime_str(row["created_at"]),
+            "items": list(items),
+        }
+
+
+class SellerQueueRowSerializer(OrderRowSerializer):
+    """Queue entries: the order with only the requesting seller's lines."""
+
+    def to_representation_many(self, rows):
+        seller = self.context["seller"]
+        items = item_rows([row["id"] for row in rows], seller=seller)
+        return [self.to_representation(row, items[row["id"]]) for row in rows]
@@ -0,0 +1,136 @@
+"""
+Seller sales rollups.
+
+``SellerDailySales`` holds one row per seller, product and day. Every path
+that changes an order's lines passes ``record_sales`` the signed change per
+product, and the rollup moves inside the same transaction. The write is one
+``INSERT ... ON CONFLICT DO NOTHING`` for missing rows and one conditional
+UPDATE, however many products the change touches. ``sales_rows`` rebuilds
+the rows from the order lines, for ``rebuild_sales_rollup``.
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import (
+    Case,
+    Count,
+    DecimalField,
+    F,
+    IntegerField,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from orders.models import Order, OrderItem, SellerDailySales
+
+FIELDS = ("units", "revenue", "orders")
+
+
+def order_day(order):
+    return timezone.localdate(order.created_at)
+
+
+def line_changes(lines, sign=1):
+    """
+    ``record_sales`` changes for adding (``sign=1``) or taking away
+    (``sign=-1``) every line in ``lines``, whose products must be loaded.
+    Each product counts as one order however many lines it has.
+    """
+    changes = {}
+    for line in lines:
+        key = (line.product.seller_id, line.product_id)
+        units, revenue, _ = changes.get(key, (0, Decimal("0"), 0))
+        changes[key] = (
+            units + sign * line.quantity,
+            revenue + sign * line.line_total,
+            sign,
+        )
+    return changes
+
+
+def item_change(item, units, orders=0):
+    """The change for moving one line by ``units``; its product must be loaded."""
+    return {
+        (item.product.seller_id, item.product_id): (units, units * item.price, orders)
+    }
+
+
+def merge_changes(*changes):
+    merged = defaultdict(lambda: (0, Decimal("0"), 0))
+    for change in changes:
+        for key, delta in change.items():
+            merged[key] = tuple(a + b for a, b in zip(merged[key], delta))
+    return merged
+
+
+def record_sales(order, changes):
+    """
+    Move ``order``'s rollup rows by ``changes``, a mapping of
+    ``(seller_id, product_id)`` to ``(units, revenue, orders)`` deltas.
+    Call it inside the transaction that changes the lines.
+    """
+    changes = {key: delta for key, delta in changes.items() if any(delta)}
+    if not changes:
+        return
+    day = order_day(order)
+    SellerDailySales.objects.bulk_create(
+        [
+            SellerDailySales(seller_id=seller_id, product_id=product_id, day=day)
+            for seller_id, product_id in changes
+        ],
+        ignore_conflicts=True,
+    )
+    output_fields = {
+        "units": IntegerField(),
+        "revenue": DecimalField(max_digits=14, decimal_places=2),
+        "orders": IntegerField(),
+    }
+    updates = {}
+    for index, field in enumerate(FIELDS):
+        whens = [
+            When(
+                seller_id=seller_id,
+                product_id=product_id,
+                then=F(field) + Value(delta[index], output_fields[field]),
+            )
+            for (seller_id, product_id), delta in changes.items()
+            if delta[index]
+        ]
+        if whens:
+            updates[field] = Case(
+                *whens, default=F(field), output_field=output_fields[field]
+            )
+    SellerDailySales.objects.filter(
+        day=day, product__in={product_id for _, product_id in changes}
+    ).update(**updates)
+
+
+def sales_rows(product_ids):
+    """Rollup rows for ``product_ids`` recomputed from their order lines."""
+    rows = (
+        OrderItem.objects.filter(product__in=product_ids)
+        .exclude(order__status=Order.STATUS_CANCELED)
+        .annotate(day=TruncDate("order__created_at"))
+        .order_by()
+        .values("product__seller", "product", "day")
+        .annotate(
+            units=Sum("quantity"),
+            revenue=Sum(F("price") * F("quantity")),
+            orders=Count("order", distinct=True),
+        )
+    )
+    return [
+        SellerDailySales(
+            seller_id=row["product__seller"],
+            product_id=row["product"],
+            day=row["day"],
+            units=row["units"],
+            revenue=row["revenue"],
+            orders=row["orders"],
+        )
+        for row in rows.iterator()
+    ]
@@ -1,7 +1,18 @@
+from collections import Counter
+from datetime import timedelta
+
 from django.contrib.auth import get_user_model
 from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
+
+from food_delivery.metrics import TimedSerializerMixin
+from orders.events import publish_delivered, publish_status
 from orders.models import OrderItem, Order
+from orders.queue import enqueue, sync_status
+from orders.rollups import line_changes, record_sales
+from orders.services import OP_ADD, OP_REMOVE, OP_SET_QUANTITY, cancel_order
+from products import inventory
 from products.models import Product
 
 User = get_user_model()
@@ -47,7 +58,7 @@ class OrderItemReadSerializer(serializers.ModelSerializer):
         return obj.price * obj.quantity
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     items = OrderItemReadSerializer(many=True, read_only=True)
 
     class Meta:
@@ -77,40 +88,40 @@ class OrderCreateSerializer(serializers.Serializer):
             raise serializers.ValidationError("Order must contain at least one item")
         return attrs
 
-    @transaction.atomic
+    @inventory.atomic_with_retry
     def create(self, validated_data):
-        request_user = self.context["request"].user
-        target_user = (
-            validated_data.pop("user_id", None) if "user_id" in validated_data else None
-        )
-        order_user = target_user or request_user
+        # Read, not pop: atomic_with_retry reruns this with the same dict.
+        order_user = validated_data.get("user_id") or self.context["request"].user
 
         items_data = validated_data["items"]
 
-        order = Order.objects.create(
-            user=order_user, status=Order.STATUS_PENDING, total_price=0
-        )
-        total = 0
-
+        quantities = Counter()
         for item in items_data:
-            product = item["product"]
-            qty = item["quantity"]
-
-            product.refresh_from_db()
-
-            if product.stock < qty:
-                raise serializers.ValidationError(
-                    f"Insufficient stock for '{product.name}'. Available: {product.stock}"
+            quantities[item["product"].pk] += item["quantity"]
+        try:
+            products = inventory.reserve(quantities)
+        except (inventory.InsufficientStock, Product.DoesNotExist) as exc:
+            # A product deleted after validation looked it up.
+            raise serializers.ValidationError(str(exc))
+
+        lines = []
+        for item in items_data:
+            product = products[item["product"].pk]
+            lines.append(
+                OrderItem(
+                    product=product, quantity=item["quantity"], price=product.price
                 )
-            product.stock -= qty
-            product.save(update_fields=["stock"])
-            oi = OrderItem.objects.create(
-                order=order, product=product, quantity=qty, price=product.price
             )
-            total += oi.line_total
+        total = sum(line.line_total for line in lines)
 
-        order.total_price = total
-        order.save(update_fields=["total_price"])
+        order = Order.objects.create(
+            user=order_user, status=Order.STATUS_PENDING, total_price=total
+        )
+        for line in lines:
+            line.order = order
+        OrderItem.objects.bulk_create(lines)
+        record_sales(order, line_changes(lines))
+        enqueue(order, {line.product.seller_id for line in lines})
         return order
 
 
@@ -160,6 +171,70 @@ class OrderStatusUpdateSerializer(serializers.ModelSerializer):
             )
         return attrs
 
+    def update(self, instance, validated_data):
+        if validated_data["status"] == Order.STATUS_CANCELED:
+            cancel_order(instance)
+            return instance
+        with transaction.atomic():
+            instance = super().update(instance, validated_data)
+            sync_status(instance)
+            publish_status(instance)
+            if instance.status == Order.STATUS_DELIVERED:
+                publish_delivered(instance)
+        return instance
+
 
 class OrderItemQuantityUpdateSerializer(serializers.Serializer):
     quantity = serializers.IntegerField(min_value=1, help_text="New quantity (>=1)")
+
+
+class OrderItemOperationSerializer(serializers.Serializer):
+    OP_SET_QUANTITY = OP_SET_QUANTITY
+    OP_REMOVE = OP_REMOVE
+    OP_ADD = OP_ADD
+    OP_CHOICES = [
+        (OP_SET_QUANTITY, "Set quantity"),
+        (OP_REMOVE, "Remove"),
+        (OP_ADD, "Add"),
+    ]
+    op = serializers.ChoiceField(choices=OP_CHOICES)
+    item_id = serializers.IntegerField(required=False)
+    product_id = serializers.IntegerField(required=False)
+    quantity = serializers.IntegerField(min_value=1, required=False)
+
+    def validate(self, attrs):
+        op = attrs["op"]
+        if op in (self.OP_SET_QUANTITY, self.OP_REMOVE) and "item_id" not in attrs:
+            raise serializers.ValidationError(f"'{op}' requires item_id")
+        if op == self.OP_ADD and "product_id" not in attrs:
+            raise serializers.ValidationError("'add' requires product_id")
+        if op in (self.OP_SET_QUANTITY, self.OP_ADD) and "quantity" not in attrs:
+            raise serializers.ValidationError(f"'{op}' requires quantity")
+        return attrs
+
+
+class OrderItemBatchSerializer(serializers.Serializer):
+    operations = OrderItemOperationSerializer(many=True, allow_empty=False)
+
+
+class SellerSalesQuerySerializer(serializers.Serializer):
+    DEFAULT_DAYS = 30
+
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    seller = serializers.IntegerField(
+        required=False, help_text="Staff only: whose sales to report."
+    )
+    limit = serializers.IntegerField(min_value=1, max_value=500, default=50)
+
+    def validate(self, attrs):
+        end = attrs.setdefault("end", timezone.localdate())
+        start = attrs.setdefault("start", end - timedelta(days=self.DEFAULT_DAYS - 1))
+        if start > end:
+            raise serializers.ValidationError("start must not be after end")
+        user = self.context["request"].user
+        if not user.is_staff:
+            attrs["seller"] = user.pk
+        elif "seller" not in attrs:
+            raise serializers.ValidationError("seller is required")
+        return attrs
@@ -0,0 +1,157 @@
+from collections import Counter
+from decimal import Decimal
+
+from django.db.models import DecimalField, F, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from orders.events import publish_status
+from orders.models import Order, OrderItem
+from orders.queue import move_sellers, sync_status
+from orders.rollups import line_changes, merge_changes, record_sales
+from products import inventory
+from products.models import Product
+
+
+@inventory.atomic_with_retry
+def cancel_order(order):
+    """
+    Cancel ``order`` and return its reserved quantities to stock.
+
+    Lines are grouped per product and released in one UPDATE, so the cost is
+    the same for a one-line order and a hundred-line one; the sales rollup
+    is taken back the same way. Returns ``False`` without touching stock if
+    the order was already canceled.
+    """
+    locked = Order.objects.select_for_update().only("status").get(pk=order.pk)
+    if locked.status == Order.STATUS_CANCELED:
+        return False
+    lines = list(order.items.select_related("product"))
+    quantities = Counter()
+    for line in lines:
+        quantities[line.product_id] += line.quantity
+    inventory.release(quantities)
+    order.status = Order.STATUS_CANCELED
+    order.save(update_fields=["status", "updated_at"])
+    record_sales(order, line_changes(lines, sign=-1))
+    sync_status(order)
+    publish_status(order)
+    return True
+
+
+def apply_total_delta(order, delta):
+    """
+    Shift ``order.total_price`` by ``delta`` with an atomic F() update.
+
+    Callers hold the order row lock, so the in-memory total can be moved by
+    the same amount instead of being read back. ``updated_at`` is stamped
+    even for a zero delta: the lines changed, so the order's ETag must too.
+    """
+    now = timezone.now()
+    Order.objects.filter(pk=order.pk).update(
+        total_price=F("total_price") + delta, updated_at=now
+    )
+    order.total_price += delta
+    order.updated_at = now
+
+
+def line_total_sum():
+    return Coalesce(
+        Sum(F("items__price") * F("items__quantity")),
+        Decimal("0"),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+
+
+def aggregate_total(order):
+    """Recompute the order total from its lines on the database side."""
+    return Order.objects.filter(pk=order.pk).aggregate(total=line_total_sum())["total"]
+
+
+OP_SET_QUANTITY = "set_quantity"
+OP_REMOVE = "remove"
+OP_ADD = "add"
+
+
+class OrderEditError(Exception):
+    pass
+
+
+def apply_item_operations(order, operations):
+    """
+    Apply a batch of line edits to a locked, pending ``order``.
+
+    ``operations`` are validated ``OrderItemOperationSerializer`` dicts. All
+    stock changes go through a single inventory pass and the total through a
+    single delta update, so the query count does not grow with the batch.
+    Raises ``OrderEditError`` or ``inventory.InsufficientStock``.
+    """
+    items = {item.pk: item for item in order.items.select_related("product")}
+    quantities = {pk: item.quantity for pk, item in items.items()}
+    added = []
+    for operation in operations:
+        op = operation["op"]
+        if op == OP_ADD:
+            added.append((operation["product_id"], operation["quantity"]))
+            continue
+        item_id = operation["item_id"]
+        if quantities.get(item_id) is None:
+            raise OrderEditError(f"Order item {item_id} not found.")
+        quantities[item_id] = operation["quantity"] if op == OP_SET_QUANTITY else None
+
+    if not added and all(qty is None for qty in quantities.values()):
+        raise OrderEditError(
+            "An order must contain at least one item. Use /cancel/ to cancel the order."
+        )
+
+    before = line_changes(items.values(), sign=-1)
+    deltas = Counter()
+    total_delta = 0
+    removed = []
+    changed = []
+    for pk, qty in quantities.items():
+        item = items[pk]
+        if qty == item.quantity:
+            continue
+        delta = (qty or 0) - item.quantity
+        deltas[item.product_id] += delta
+        total_delta += item.price * delta
+        if qty is None:
+            removed.append(pk)
+        else:
+            item.quantity = qty
+            changed.append(item)
+    for product_id, qty in added:
+        deltas[product_id] += qty
+
+    try:
+        products = inventory.adjust(deltas)
+    except Product.DoesNotExist as exc:
+        raise OrderEditError(str(exc))
+    missing = {product_id for product_id, _ in added} - products.keys()
+    if missing:
+        # Lines whose stock delta netted out to zero were not locked above.
+        products.update(Product.objects.in_bulk(missing))
+
+    new_items = []
+    for product_id, qty in added:
+        product = products[product_id]
+        new_items.append(
+            OrderItem(order=order, product=product, quantity=qty, price=product.price)
+        )
+        total_delta += product.price * qty
+
+    if removed:
+        OrderItem.objects.filter(pk__in=removed).delete()
+    if changed:
+        OrderItem.objects.bulk_update(changed, ["quantity"])
+    if new_items:
+        OrderItem.objects.bulk_create(new_items)
+    apply_total_delta(order, total_delta)
+    kept = [item for pk, item in items.items() if quantities[pk] is not None]
+    record_sales(order, merge_changes(before, line_changes(kept + new_items)))
+    move_sellers(
+        order,
+        {item.product.seller_id for item in items.values()},
+        {line.product.seller_id for line in kept + new_items},
+    )
@@ -1,3 +1,1546 @@
-from django.test import TestCase
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection, transaction
+from asgiref.sync import sync_to_async
+from django.test import AsyncClient, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import User
+from food_delivery.metrics import exposition
+from food_delivery.testing import QueryBudgetMixin, QueryPlanAssertionsMixin
+from food_delivery.throttling import FixedWindowRateThrottle
+from orders import outbox
+from orders.idempotency import Entry
+from orders.events import (
+    STATUS_CHANGED,
+    InProcessBroker,
+    get_broker,
+    order_channel,
+    publish_status,
+)
+from orders.models import (
+    IdempotencyKey,
+    Order,
+    OrderItem,
+    OutboxEvent,
+    SellerDailySales,
+    SellerOrder,
+    VerifiedPurchase,
+)
+from orders.rollups import sales_rows
+from orders.serializers import (
+    OrderCreateSerializer,
+    OrderSerializer,
+    OrderStatusUpdateSerializer,
+)
+from orders.management.commands.marketplace_load_test import ROUTES
+from orders.management.commands.reconcile_stock import committed_quantities
+from orders.services import aggregate_total, cancel_order
+from orders.views import SellerQueuePagination
+from products import inventory
+from products.models import Category, Product
+from reviews.models import Review
+
+
+class OrderTestMixin:
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_users()
+
+    @classmethod
+    def create_users(cls):
+        cls.customer = User.objects.create_user(
+            username="customer", password="pass", role=User.ROLE_CUSTOMER
+        )
+        cls.seller = User.objects.create_user(
+            username="seller", password="pass", role=User.ROLE_SELLER
+        )
+        cls.category = Category.objects.create(name="Pizza", slug="pizza")
+
+    def make_products(self, count, stock=10, price="5.00"):
+        return [
+            Product.objects.create(
+                seller=self.seller,
+                category=self.category,
+                name=f"Product {i}",
+                price=Decimal(price),
+                stock=stock,
+            )
+            for i in range(count)
+        ]
+
+    def drain_outbox(self):
+        return outbox.Worker().drain()
+
+    def create_order(self, items, user=None):
+        request = APIRequestFactory().post("/api/orders/orders/")
+        request.user = user or self.customer
+        serializer = OrderCreateSerializer(
+            data={"items": items}, context={"request": request}
+        )
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
+
+
+class OrderCreateTests(OrderTestMixin, TestCase):
+    def test_create_reserves_stock_and_totals(self):
+        first, second = self.make_products(2, stock=10)
+        order = self.create_order(
+            [
+                {"product_id": first.pk, "quantity": 2},
+                {"product_id": second.pk, "quantity": 3},
+                {"product_id": first.pk, "quantity": 1},
+            ]
+        )
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.stock, 7)
+        self.assertEqual(second.stock, 7)
+        self.assertEqual(order.items.count(), 3)
+        self.assertEqual(order.total_price, Decimal("30.00"))
+
+    def test_short_line_rejects_whole_order(self):
+        first, second = self.make_products(2, stock=2)
+        with self.assertRaises(serializers.ValidationError):
+            self.create_order(
+                [
+                    {"product_id": first.pk, "quantity": 1},
+                    {"product_id": second.pk, "quantity": 1},
+                    {"product_id": second.pk, "quantity": 2},
+                ]
+            )
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.stock, second.stock), (2, 2))
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+
+    def test_product_deleted_after_validation_rejects_the_order(self):
+        first, second = self.make_products(2)
+        request = APIRequestFactory().post("/api/orders/orders/")
+        request.user = self.customer
+        serializer = OrderCreateSerializer(
+            data={
+                "items": [
+                    {"product_id": first.pk, "quantity": 1},
+                    {"product_id": second.pk, "quantity": 1},
+                ]
+            },
+            context={"request": request},
+        )
+        serializer.is_valid(raise_exception=True)
+        second.delete()
+        with self.assertRaises(serializers.ValidationError):
+            serializer.save()
+        first.refresh_from_db()
+        self.assertEqual(first.stock, 10)
+        self.assertFalse(Order.objects.exists())
+
+    def test_create_query_count_is_independent_of_basket_size(self):
+        counts = []
+        for size in (1, 30):
+            items = [
+                {"product_id": product.pk, "quantity": 1}
+                for product in self.make_products(size)
+            ]
+            request = APIRequestFactory().post("/api/orders/orders/")
+            request.user = self.customer
+            serializer = OrderCreateSerializer(
+                data={"items": items}, context={"request": request}
+            )
+            serializer.is_valid(raise_exception=True)
+            with CaptureQueriesContext(connection) as ctx:
+                serializer.save()
+            counts.append(len(ctx))
+        self.assertEqual(counts[0], counts[1])
+
+
+class OrderCancelTests(OrderTestMixin, TestCase):
+    def test_cancel_returns_stock(self):
+        first, second = self.make_products(2, stock=10)
+        order = self.create_order(
+            [
+                {"product_id": first.pk, "quantity": 2},
+                {"product_id": second.pk, "quantity": 3},
+                {"product_id": first.pk, "quantity": 4},
+            ]
+        )
+        self.assertTrue(cancel_order(order))
+        self.assertFalse(cancel_order(order))
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.stock, first.reserved), (10, 0))
+        self.assertEqual((second.stock, second.reserved), (10, 0))
+        self.assertEqual(order.status, Order.STATUS_CANCELED)
+
+    def test_cancel_query_count_is_independent_of_order_size(self):
+        counts = []
+        for size in (1, 30):
+            order = self.create_order(
+                [
+                    {"product_id": product.pk, "quantity": 1}
+                    for product in self.make_products(size)
+                ]
+            )
+            with CaptureQueriesContext(connection) as ctx:
+                cancel_order(order)
+            counts.append(len(ctx))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_admin_transition_to_canceled_returns_stock(self):
+        (product,) = self.make_products(1, stock=5)
+        order = self.create_order([{"product_id": product.pk, "quantity": 5}])
+        admin = User.objects.create_user(
+            username="admin", password="pass", is_staff=True
+        )
+        request = APIRequestFactory().patch("/")
+        request.user = admin
+        serializer = OrderStatusUpdateSerializer(
+            order,
+            data={"status": Order.STATUS_CANCELED},
+            partial=True,
+            context={"request": request},
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 5)
+
+
+class VerifiedPurchaseTests(OrderTestMixin, TestCase):
+    def deliver(self, order):
+        Order.objects.filter(pk=order.pk).update(status=Order.STATUS_SHIPPED)
+        order.refresh_from_db()
+        admin = User.objects.create_user(
+            username=f"admin{order.pk}", password="pass", is_staff=True
+        )
+        request = APIRequestFactory().patch("/")
+        request.user = admin
+        serializer = OrderStatusUpdateSerializer(
+            order,
+            data={"status": Order.STATUS_DELIVERED},
+            partial=True,
+            context={"request": request},
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        self.drain_outbox()
+
+    def test_delivery_records_each_product_once(self):
+        first, second = self.make_products(2)
+        order = self.create_order(
+            [
+                {"product_id": first.pk, "quantity": 1},
+                {"product_id": second.pk, "quantity": 1},
+                {"product_id": first.pk, "quantity": 2},
+            ]
+        )
+        self.deliver(order)
+        self.assertEqual(
+            set(VerifiedPurchase.objects.values_list("user", "product")),
+            {(self.customer.pk, first.pk), (self.customer.pk, second.pk)},
+        )
+
+    def test_backfill_from_delivered_orders(self):
+        first, second = self.make_products(2)
+        delivered = self.create_order([{"product_id": first.pk, "quantity": 1}])
+        self.create_order([{"product_id": second.pk, "quantity": 1}])
+        Order.objects.filter(pk=delivered.pk).update(status=Order.STATUS_DELIVERED)
+
+        call_command("backfill_verified_purchases", stdout=StringIO())
+        self.assertEqual(
+            list(VerifiedPurchase.objects.values_list("user", "product")),
+            [(self.customer.pk, first.pk)],
+        )
+
+
+class ReconcileStockTests(OrderTestMixin, TestCase):
+    def test_reports_and_repairs_drift(self):
+        first, second = self.make_products(2, stock=10)
+        self.create_order([{"product_id": first.pk, "quantity": 3}])
+        canceled = self.create_order([{"product_id": second.pk, "quantity": 4}])
+        # Simulate a cancellation that never returned its stock.
+        Order.objects.filter(pk=canceled.pk).update(status=Order.STATUS_CANCELED)
+
+        out = StringIO()
+        call_command("reconcile_stock", stdout=out)
+        self.assertIn(f"Product {second.pk} '", out.getvalue())
+        self.assertNotIn(f"Product {first.pk} '", out.getvalue())
+        second.refresh_from_db()
+        self.assertEqual(second.stock, 6)
+
+        call_command("reconcile_stock", "--fix", stdout=StringIO())
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.stock, first.reserved), (7, 3))
+        self.assertEqual((second.stock, second.reserved), (10, 0))
+
+    def test_skips_products_whose_stock_would_go_negative(self):
+        (product,) = self.make_products(1, stock=10)
+        self.create_order([{"product_id": product.pk, "quantity": 3}])
+        # Reserved lost units that stock never received back.
+        Product.objects.filter(pk=product.pk).update(stock=1, reserved=0)
+
+        out = StringIO()
+        call_command("reconcile_stock", "--fix", stdout=out)
+        self.assertIn(f"Skipped product {product.pk}", out.getvalue())
+        self.assertIn("Repaired 0 product(s).", out.getvalue())
+        product.refresh_from_db()
+        self.assertEqual((product.stock, product.reserved), (1, 0))
+
+
+class OrderItemMutationTests(OrderTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+        self.first, self.second = self.make_products(2, stock=10, price="2.50")
+        self.order = self.create_order(
+            [
+                {"product_id": self.first.pk, "quantity": 2},
+                {"product_id": self.second.pk, "quantity": 1},
+            ]
+        )
+        self.first_item, self.second_item = self.order.items.order_by("pk")
+
+    def test_update_item_quantity_applies_delta(self):
+        url = f"/api/orders/orders/{self.order.pk}/items/{self.first_item.pk}/quantity/"
+        response = self.client.patch(url, {"quantity": 5}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["total_price"], "15.00")
+        self.order.refresh_from_db()
+        self.first.refresh_from_db()
+        self.assertEqual(self.order.total_price, aggregate_total(self.order))
+        self.assertEqual(self.first.stock, 5)
+
+        response = self.client.patch(url, {"quantity": 20}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.stock, 5)
+
+    def test_remove_item_applies_delta(self):
+        url = f"/api/orders/orders/{self.order.pk}/items/{self.second_item.pk}/"
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["total_price"], "5.00")
+        self.order.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual(self.order.total_price, aggregate_total(self.order))
+        self.assertEqual(self.second.stock, 10)
+
+    def batch(self, operations):
+        return self.client.post(
+            f"/api/orders/orders/{self.order.pk}/items/batch/",
+            {"operations": operations},
+            format="json",
+        )
+
+    def test_batch_applies_all_operations(self):
+        (third,) = self.make_products(1, stock=4, price="1.00")
+        response = self.batch(
+            [
+                {"op": "set_quantity", "item_id": self.first_item.pk, "quantity": 4},
+                {"op": "remove", "item_id": self.second_item.pk},
+                {"op": "add", "product_id": third.pk, "quantity": 3},
+            ]
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["total_price"], "13.00")
+        self.assertEqual(len(response.data["items"]), 2)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.total_price, aggregate_total(self.order))
+        stocks = dict(
+            Product.objects.filter(
+                pk__in=[self.first.pk, self.second.pk, third.pk]
+            ).values_list("pk", "stock")
+        )
+        self.assertEqual(stocks, {self.first.pk: 6, self.second.pk: 10, third.pk: 1})
+
+    def test_batch_is_all_or_nothing(self):
+        response = self.batch(
+            [
+                {"op": "set_quantity", "item_id": self.first_item.pk, "quantity": 3},
+                {"op": "set_quantity", "item_id": self.second_item.pk, "quantity": 50},
+            ]
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.batch(
+            [
+                {"op": "remove", "item_id": self.first_item.pk},
+                {"op": "remove", "item_id": self.second_item.pk},
+            ]
+        )
+        self.assertEqual(response.status_code, 400)
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual((self.first.stock, self.second.stock), (8, 9))
+        self.assertEqual(self.order.items.count(), 2)
+
+    def test_batch_query_count_is_independent_of_batch_size(self):
+        counts = []
+        for size in (1, 20):
+            operations = [
+                {"op": "add", "product_id": product.pk, "quantity": 1}
+                for product in self.make_products(size)
+            ]
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertEqual(self.batch(operations).status_code, 200)
+            counts.append(len(ctx))
+        self.assertEqual(counts[0], counts[1])
+
+
+class SellerSalesRollupTests(OrderTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+        self.first, self.second = self.make_products(2, stock=20, price="2.50")
+        self.order = self.create_order(
+            [
+                {"product_id": self.first.pk, "quantity": 2},
+                {"product_id": self.first.pk, "quantity": 1},
+                {"product_id": self.second.pk, "quantity": 1},
+            ]
+        )
+        self.items = list(self.order.items.order_by("pk"))
+        self.url = f"/api/orders/orders/{self.order.pk}/items/"
+
+    def rollup(self):
+        return {
+            row.product_id: (row.units, row.revenue, row.orders)
+            for row in SellerDailySales.objects.all()
+        }
+
+    def assertMatchesLines(self):
+        rebuilt = {
+            row.product_id: (row.units, row.revenue, row.orders)
+            for row in sales_rows([self.first.pk, self.second.pk])
+        }
+        live = {pk: row for pk, row in self.rollup().items() if any(row)}
+        self.assertEqual(live, rebuilt)
+
+    def test_create_records_units_revenue_and_orders(self):
+        self.assertEqual(
+            self.rollup(),
+            {
+                self.first.pk: (3, Decimal("7.50"), 1),
+                self.second.pk: (1, Decimal("2.50"), 1),
+            },
+        )
+        row = SellerDailySales.objects.get(product=self.first)
+        self.assertEqual((row.seller, row.day), (self.seller, timezone.localdate()))
+
+    def test_item_edits_move_the_rollup(self):
+        response = self.client.patch(
+            f"{self.url}{self.items[0].pk}/quantity/", {"quantity": 5}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertMatchesLines()
+
+        # Another line of the same product remains, so the order still counts.
+        self.assertEqual(
+            self.client.delete(f"{self.url}{self.items[1].pk}/").status_code, 200
+        )
+        self.assertEqual(self.rollup()[self.first.pk], (5, Decimal("12.50"), 1))
+        self.assertMatchesLines()
+
+        (third,) = self.make_products(1, stock=5, price="1.00")
+        response = self.client.post(
+            f"{self.url}batch/",
+            {
+                "operations": [
+                    {"op": "remove", "item_id": self.items[2].pk},
+                    {"op": "add", "product_id": third.pk, "quantity": 2},
+                ]
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.rollup()[self.second.pk], (0, Decimal("0.00"), 0))
+        self.assertEqual(self.rollup()[third.pk], (2, Decimal("2.00"), 1))
+
+    def test_cancel_takes_the_order_back_out(self):
+        cancel_order(self.order)
+        self.assertFalse(any(any(row) for row in self.rollup().values()))
+
+    def test_rebuild_recomputes_from_lines(self):
+        SellerDailySales.objects.update(units=99)
+        SellerDailySales.objects.filter(product=self.second).delete()
+        self.create_order([{"product_id": self.second.pk, "quantity": 4}])
+        call_command("rebuild_sales_rollup", "--batch-size", "1", stdout=StringIO())
+        self.assertEqual(
+            self.rollup(),
+            {
+                self.first.pk: (3, Decimal("7.50"), 1),
+                self.second.pk: (5, Decimal("12.50"), 2),
+            },
+        )
+
+
+class SellerSalesAPITests(OrderTestMixin, TestCase):
+    url = "/api/orders/seller-sales/"
+
+    def setUp(self):
+        self.client = APIClient()
+        self.first, self.second = self.make_products(2, stock=20, price="3.00")
+        self.create_order([{"product_id": self.first.pk, "quantity": 2}])
+        self.create_order(
+            [
+                {"product_id": self.first.pk, "quantity": 1},
+                {"product_id": self.second.pk, "quantity": 5},
+            ]
+        )
+        yesterday = timezone.localdate() - timedelta(days=1)
+        SellerDailySales.objects.create(
+            seller=self.seller,
+            product=self.first,
+            day=yesterday,
+            units=1,
+            revenue=Decimal("3.00"),
+            orders=1,
+        )
+
+    def test_seller_sees_days_and_top_products(self):
+        self.client.force_authenticate(self.seller)
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.data["totals"], {"units": 9, "revenue": "27.00", "orders": 4}
+        )
+        self.assertEqual([day["units"] for day in response.data["days"]], [1, 8])
+        self.assertEqual(
+            [(row["product"], row["revenue"]) for row in response.data["products"]],
+            [(self.second.pk, "15.00"), (self.first.pk, "12.00")],
+        )
+
+    def test_date_range_and_limit(self):
+        self.client.force_authenticate(self.seller)
+        today = timezone.localdate().isoformat()
+        response = self.client.get(self.url, {"start": today, "limit": 1})
+        self.assertEqual(response.data["totals"]["units"], 8)
+        self.assertEqual(len(response.data["products"]), 1)
+        response = self.client.get(self.url, {"start": today, "end": "2000-01-01"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_access(self):
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        admin = User.objects.create_user(username="admin", password="x", is_staff=True)
+        self.client.force_authenticate(admin)
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+        response = self.client.get(self.url, {"seller": self.seller.pk})
+        self.assertEqual(response.data["totals"]["units"], 9)
+
+
+class SellerOrderQueueTests(OrderTestMixin, QueryPlanAssertionsMixin, TestCase):
+    url = "/api/orders/orders/queue/"
+
+    def setUp(self):
+        cache.clear()
+        self.other_seller = User.objects.create_user(
+            username="other", password="pass", role=User.ROLE_SELLER
+        )
+        (self.mine,) = self.make_products(1, stock=20)
+        self.theirs = Product.objects.create(
+            seller=self.other_seller,
+            category=self.category,
+            name="Theirs",
+            price=Decimal("4.00"),
+            stock=20,
+        )
+        self.order = self.create_order(
+            [
+                {"product_id": self.mine.pk, "quantity": 1},
+                {"product_id": self.theirs.pk, "quantity": 2},
+            ]
+        )
+        self.client = APIClient()
+
+    def queued(self):
+        return set(SellerOrder.objects.values_list("seller", "order", "status"))
+
+    def set_status(self, order, status):
+        request = APIRequestFactory().patch("/")
+        request.user = User.objects.create_user(
+            username=f"staff-{status}", password="pass", is_staff=True
+        )
+        serializer = OrderStatusUpdateSerializer(
+            order, data={"status": status}, partial=True, context={"request": request}
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+    def test_queue_follows_order_status(self):
+        pending = Order.STATUS_PENDING
+        self.assertEqual(
+            self.queued(),
+            {
+                (self.seller.pk, self.order.pk, pending),
+                (self.other_seller.pk, self.order.pk, pending),
+            },
+        )
+        self.set_status(self.order, Order.STATUS_PROCESSING)
+        self.assertEqual(
+            {status for _, _, status in self.queued()}, {Order.STATUS_PROCESSING}
+        )
+        self.set_status(self.order, Order.STATUS_SHIPPED)
+        self.assertEqual(self.queued(), set())
+
+        other = self.create_order([{"product_id": self.mine.pk, "quantity": 1}])
+        cancel_order(other)
+        self.assertEqual(self.queued(), set())
+
+    def test_queue_follows_order_lines(self):
+        self.client.force_authenticate(self.customer)
+        mine, theirs = self.order.items.order_by("pk")
+        url = f"/api/orders/orders/{self.order.pk}/items/"
+        self.assertEqual(self.client.delete(f"{url}{theirs.pk}/").status_code, 200)
+        self.assertEqual(
+            self.queued(), {(self.seller.pk, self.order.pk, Order.STATUS_PENDING)}
+        )
+        response = self.client.post(
+            f"{url}batch/",
+            {
+                "operations": [
+                    {"op": "add", "product_id": self.theirs.pk, "quantity": 1}
+                ]
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.queued()), 2)
+
+    def test_seller_sees_open_orders_with_their_lines(self):
+        later = self.create_order([{"product_id": self.mine.pk, "quantity": 3}])
+        self.create_order([{"product_id": self.theirs.pk, "quantity": 1}])
+        self.set_status(later, Order.STATUS_PROCESSING)
+
+        self.client.force_authenticate(self.seller)
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        results = response.data["results"]
+        self.assertEqual(
+            [(row["id"], row["status"]) for row in results],
+            [(self.order.pk, "pending"), (later.pk, "processing")],
+        )
+        self.assertEqual(
+            [item["product"] for item in results[0]["items"]], [self.mine.pk]
+        )
+
+        response = self.client.get(self.url, {"status": "processing"})
+        self.assertEqual([row["id"] for row in response.data["results"]], [later.pk])
+        response = self.client.get(self.url, {"page_size": 1})
+        self.assertEqual(len(response.data["results"]), 1)
+        response = self.client.get(response.data["next"])
+        self.assertEqual([row["id"] for row in response.data["results"]], [later.pk])
+
+    def test_seller_moves_a_queued_order(self):
+        url = f"/api/orders/orders/{self.order.pk}/status/"
+        outsider = User.objects.create_user(
+            username="outsider", password="pass", role=User.ROLE_SELLER
+        )
+        self.client.force_authenticate(outsider)
+        response = self.client.patch(url, {"status": "processing"}, format="json")
+        self.assertEqual(response.status_code, 404)
+
+        self.client.force_authenticate(self.seller)
+        response = self.client.patch(url, {"status": "processing"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["status"], Order.STATUS_PROCESSING)
+        self.assertEqual(
+            {status for _, _, status in self.queued()}, {Order.STATUS_PROCESSING}
+        )
+
+        # Shipping takes the order out of the queue the seller was scoped to.
+        response = self.client.patch(url, {"status": "shipped"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["status"], Order.STATUS_SHIPPED)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, Order.STATUS_SHIPPED)
+        self.assertEqual(self.queued(), set())
+
+    def test_rejects_customers_and_closed_statuses(self):
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.client.force_authenticate(self.seller)
+        response = self.client.get(self.url, {"status": "shipped"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_queue_is_an_index_range_scan(self):
+        queue = SellerOrder.objects.filter(seller=self.seller).order_by(
+            *SellerQueuePagination.ordering
+        )
+        self.assertUsesIndex(queue, "sellerorder_queue_idx")
+        self.assertUsesIndex(queue.filter(status="pending"), "sellerorder_queue_idx")
+
+    def test_backfill_rebuilds_the_queue(self):
+        expected = self.queued()
+        SellerOrder.objects.all().delete()
+        call_command("backfill_seller_queue", stdout=StringIO())
+        self.assertEqual(self.queued(), expected)
+
+
+class OrderReadPathTests(OrderTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def place_orders(self, count, lines=3):
+        products = self.make_products(lines, stock=100, price="3.35")
+        return [
+            self.create_order(
+                [
+                    {"product_id": product.pk, "quantity": i + 1}
+                    for i, product in enumerate(products)
+                ]
+            )
+            for _ in range(count)
+        ]
+
+    def test_list_and_retrieve_match_order_serializer(self):
+        orders = self.place_orders(3)
+        expected = OrderSerializer(
+            Order.objects.order_by("-created_at", "-id"), many=True
+        ).data
+        response = self.client.get("/api/orders/orders/")
+        self.assertEqual(
+            JSONRenderer().render(response.data["results"]),
+            JSONRenderer().render(expected),
+        )
+
+        response = self.client.get(f"/api/orders/orders/{orders[0].pk}/")
+        self.assertEqual(
+            JSONRenderer().render(response.data),
+            JSONRenderer().render(OrderSerializer(orders[0]).data),
+        )
+
+    def test_list_query_count_is_independent_of_page_size(self):
+        self.place_orders(12)
+        counts = []
+        for size in (2, 12):
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.get(f"/api/orders/orders/?page_size={size}")
+            counts.append(len(ctx))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_other_customers_orders_are_hidden(self):
+        (order,) = self.place_orders(1)
+        other = User.objects.create_user(username="other", password="pass")
+        self.client.force_authenticate(other)
+        response = self.client.get(f"/api/orders/orders/{order.pk}/")
+        self.assertEqual(response.status_code, 404)
+
+
+class OrderConditionalGetTests(OrderTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+        (self.product,) = self.make_products(1, stock=100)
+        self.order = self.create_order([{"product_id": self.product.pk, "quantity": 2}])
+        self.url = f"/api/orders/orders/{self.order.pk}/"
+
+    def test_matching_etag_answers_304_with_one_query(self):
+        response = self.client.get(self.url)
+        etag = response.headers["ETag"]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers["ETag"], etag)
+        self.assertEqual(len(ctx), 1)
+
+    def test_if_modified_since_misses_changes_within_the_second(self):
+        response = self.client.get(self.url)
+        last_modified = response.headers["Last-Modified"]
+        cancel_order(self.order)
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["status"], Order.STATUS_CANCELED)
+
+    def test_item_edits_and_cancel_change_the_etag(self):
+        etags = [self.client.get(self.url).headers["ETag"]]
+        item = self.order.items.get()
+        self.client.patch(f"{self.url}items/{item.pk}/quantity/", {"quantity": 3})
+        etags.append(self.client.get(self.url).headers["ETag"])
+        cancel_order(self.order)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etags[-1])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["status"], Order.STATUS_CANCELED)
+        self.assertNotEqual(etags[0], etags[1])
+
+    def test_other_users_etag_does_not_reveal_the_order(self):
+        etag = self.client.get(self.url).headers["ETag"]
+        other = User.objects.create_user(username="other", password="pass")
+        self.client.force_authenticate(other)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 404)
+
+
+class FixedWindowThrottleTests(OrderTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def make_throttle(self, rate, now=1000.0):
+        throttle = FixedWindowRateThrottle.__new__(FixedWindowRateThrottle)
+        throttle.rate = rate
+        throttle.num_requests, throttle.duration = throttle.parse_rate(rate)
+        throttle.get_cache_key = lambda request, view: "throttle_test_client"
+        throttle.timer = lambda: now
+        return throttle
+
+    def test_orders_scope_rejects_the_sixth_request_in_a_minute(self):
+        client = APIClient()
+        client.force_authenticate(self.customer)
+        statuses = [client.get("/api/orders/orders/").status_code for _ in range(6)]
+        self.assertEqual(statuses, [200] * 5 + [429])
+        self.assertIn("Retry-After", client.get("/api/orders/orders/").headers)
+
+    def test_counter_is_one_integer_and_resets_each_window(self):
+        throttle = self.make_throttle("2/min", now=1000.0)
+        self.assertEqual(
+            [throttle.allow_request(None, None) for _ in range(3)],
+            [True, True, False],
+        )
+        self.assertEqual(cache.get("throttle_test_client:16"), 3)
+        self.assertEqual(throttle.wait(), 20)
+        self.assertTrue(
+            self.make_throttle("2/min", now=1020.0).allow_request(None, None)
+        )
+
+    def test_concurrent_requests_never_exceed_the_limit(self):
+        throttle = self.make_throttle("50/min")
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            results = list(
+                pool.map(lambda _: throttle.allow_request(None, None), range(320))
+            )
+        self.assertEqual(results.count(True), 50)
+
+
+class OrderQueryBudgetTests(OrderTestMixin, QueryBudgetMixin, TestCase):
+    query_budgets = {
+        "order-list": 2,
+        "order-detail": 3,
+        "order-update-item-quantity": 16,
+        "order-batch-items": 17,
+    }
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+        self.products = self.make_products(3, stock=100)
+        self.orders = [
+            self.create_order(
+                [{"product_id": product.pk, "quantity": 1} for product in self.products]
+            )
+            for _ in range(5)
+        ]
+
+    def test_order_routes_stay_within_budget(self):
+        order = self.orders[0]
+        item = order.items.first()
+        responses = [
+            self.client.get("/api/orders/orders/"),
+            self.client.get(f"/api/orders/orders/{order.pk}/"),
+            self.client.patch(
+                f"/api/orders/orders/{order.pk}/items/{item.pk}/quantity/",
+                {"quantity": 2},
+            ),
+            self.client.post(
+                f"/api/orders/orders/{order.pk}/items/batch/",
+                {
+                    "operations": [
+                        {"op": "set_quantity", "item_id": item.pk, "quantity": 3},
+                        {"op": "add", "product_id": self.products[0].pk, "quantity": 1},
+                    ]
+                },
+                format="json",
+            ),
+        ]
+        for response in responses:
+            self.assertEqual(response.status_code, 200, response.data)
+            self.assertWithinQueryBudget(response)
+        self.assertIn("db;dur=", responses[0].headers["Server-Timing"])
+
+    def test_metrics_endpoint_exports_route_histograms(self):
+        response = self.client.get(f"/api/orders/orders/{self.orders[0].pk}/")
+        self.assertIn("serialize;dur=", response.headers["Server-Timing"])
+        self.client.get("/api/orders/orders/")
+        self.assertEqual(self.client.get("/metrics").status_code, 401)
+        staff = User.objects.create_user(
+            username="staff", password="pass", is_staff=True
+        )
+        self.client.force_login(staff)
+        body = self.client.get("/metrics").content.decode()
+        self.assertIn(
+            'http_request_queries_bucket{route="order-list",method="GET",le="2"}',
+            body,
+        )
+        self.assertIn("# TYPE http_request_duration_seconds histogram", body)
+        self.assertIn(
+            'http_request_serialize_seconds_count{route="order-detail",method="GET"}',
+            body,
+        )
+
+        self.client.logout()
+        with self.settings(METRICS_TOKEN="secret"):
+            self.assertEqual(self.client.get("/metrics").status_code, 401)
+            response = self.client.get(
+                "/metrics", headers={"Authorization": "Bearer secret"}
+            )
+            self.assertEqual(response.status_code, 200)
+
+
+class CheckOrderTotalsTests(OrderTestMixin, TestCase):
+    def test_reports_and_repairs_mismatched_totals(self):
+        (product,) = self.make_products(1, price="1.10")
+        orders = [
+            self.create_order([{"product_id": product.pk, "quantity": 3}])
+            for _ in range(3)
+        ]
+        Order.objects.filter(pk=orders[1].pk).update(total_price=Decimal("9.99"))
+
+        out = StringIO()
+        call_command("check_order_totals", "--batch-size", "2", stdout=out)
+        self.assertIn(
+            f"Order {orders[1].pk}: stored=9.99 expected=3.30", out.getvalue()
+        )
+        self.assertIn("Checked 3 order(s), 1 mismatched.", out.getvalue())
+
+        call_command("check_order_totals", "--fix", stdout=StringIO())
+        orders[1].refresh_from_db()
+        self.assertEqual(orders[1].total_price, Decimal("3.30"))
+
+
+class OrderQueryPlanTests(OrderTestMixin, QueryPlanAssertionsMixin, TestCase):
+    def test_user_order_listing_uses_index(self):
+        self.assertUsesIndex(
+            Order.objects.filter(user=self.customer).order_by("-created_at", "-id")[
+                :20
+            ],
+            "order_user_created_idx",
+        )
+
+    def test_pending_queue_uses_partial_index(self):
+        self.assertUsesIndex(
+            Order.objects.filter(status=Order.STATUS_PENDING).order_by("created_at"),
+            "order_pending_idx",
+        )
+
+    def test_review_gate_uses_index(self):
+        (product,) = self.make_products(1)
+        self.assertUsesIndex(
+            Order.objects.filter(
+                user=self.customer,
+                status=Order.STATUS_DELIVERED,
+                items__product=product,
+            )
+        )
+
+
+class OrderStatusStreamTests(OrderTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        (self.product,) = self.make_products(1)
+        self.order = self.create_order([{"product_id": self.product.pk, "quantity": 1}])
+        self.url = f"/api/orders/orders/{self.order.pk}/events/"
+
+    def auth_headers(self, user):
+        return {"Authorization": f"Bearer {AccessToken.for_user(user)}"}
+
+    def change_status(self, status):
+        request = APIRequestFactory().patch("/")
+        request.user = User.objects.create_user(
+            username=f"admin-{status}", password="pass", is_staff=True
+        )
+        serializer = OrderStatusUpdateSerializer(
+            self.order,
+            data={"status": status},
+            partial=True,
+            context={"request": request},
+        )
+        serializer.is_valid(raise_exception=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            serializer.save()
+        self.assertFalse(OutboxEvent.objects.filter(topic=STATUS_CHANGED).exists())
+
+    async def test_broker_fans_out_per_channel(self):
+        broker = InProcessBroker()
+        watchers = [broker.subscribe("order:1") for _ in range(3)]
+        other = broker.subscribe("order:2")
+        self.assertEqual(broker.publish("order:1", {"status": "shipped"}), 3)
+        for watcher in watchers:
+            self.assertEqual(await watcher.get(timeout=1), {"status": "shipped"})
+        self.assertIsNone(await other.get(timeout=0.01))
+        for watcher in [*watchers, other]:
+            watcher.close()
+        self.assertEqual(broker.subscriber_count("order:1"), 0)
+
+    async def test_stream_pushes_changes_until_the_order_is_final(self):
+        response = await AsyncClient().get(
+            self.url, headers=self.auth_headers(self.customer)
+        )
+        self.assertEqual(response.headers["Content-Type"], "text/event-stream")
+        chunks = aiter(response.streaming_content)
+
+        def payload(chunk):
+            return json.loads(chunk.decode().split("data: ", 1)[1])
+
+        first = payload(await anext(chunks))
+        self.assertEqual(first["status"], Order.STATUS_PENDING)
+        channel = order_channel(self.order.pk)
+        self.assertEqual(get_broker().subscriber_count(channel), 1)
+
+        await sync_to_async(self.change_status)(Order.STATUS_PROCESSING)
+        second = payload(await asyncio.wait_for(anext(chunks), 5))
+        self.assertEqual(second["status"], Order.STATUS_PROCESSING)
+
+        await sync_to_async(self.change_status)(Order.STATUS_CANCELED)
+        third = payload(await asyncio.wait_for(anext(chunks), 5))
+        self.assertEqual(third["status"], Order.STATUS_CANCELED)
+        with self.assertRaises(StopAsyncIteration):
+            await anext(chunks)
+        self.assertEqual(get_broker().subscriber_count(channel), 0)
+
+    async def test_only_the_owner_can_watch(self):
+        response = await AsyncClient().get(self.url)
+        self.assertEqual(response.status_code, 401)
+        other = await User.objects.acreate(username="other")
+        response = await AsyncClient().get(self.url, headers=self.auth_headers(other))
+        self.assertEqual(response.status_code, 404)
+
+
+class OutboxTests(OrderTestMixin, TestCase):
+    def failing(self, payload):
+        raise RuntimeError(f"boom {payload['n']}")
+
+    def register(self, func, name="test.handler", topic="test.topic"):
+        return (
+            mock.patch.dict(outbox.HANDLERS, {name: func}),
+            mock.patch.dict(outbox.SUBSCRIBERS, {topic: [name]}),
+        )
+
+    def test_status_change_is_queued_for_a_shared_broker(self):
+        (product,) = self.make_products(1)
+        order = self.create_order([{"product_id": product.pk, "quantity": 1}])
+        order.status = Order.STATUS_PROCESSING
+        shared = mock.Mock(in_process=False)
+        with mock.patch("orders.events.get_broker", return_value=shared):
+            publish_status(order)
+        shared.publish.assert_not_called()
+        event = OutboxEvent.objects.get()
+        self.assertEqual(event.handler, "orders.handlers.broadcast_status")
+        self.assertEqual(event.payload["status"], Order.STATUS_PROCESSING)
+        self.assertEqual(self.drain_outbox(), {outbox.OUTCOME_DONE: 1})
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_emit_is_one_insert_for_every_subscriber(self):
+        names = [f"test.handler{i}" for i in range(5)]
+        with mock.patch.dict(outbox.SUBSCRIBERS, {"test.topic": names}):
+            with self.assertNumQueries(1):
+                outbox.emit("test.topic", {"n": 1})
+        self.assertEqual(OutboxEvent.objects.count(), 5)
+
+    def test_rolled_back_change_emits_nothing(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                outbox.emit(STATUS_CHANGED, {"id": 1})
+                raise RuntimeError
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_claimed_events_are_leased(self):
+        outbox.emit(STATUS_CHANGED, {"id": 1})
+        worker = outbox.Worker()
+        self.assertEqual(len(worker.claim()), 1)
+        self.assertEqual(worker.claim(), [])
+        self.assertEqual(OutboxEvent.objects.get().attempts, 1)
+
+    def test_failures_back_off_then_go_dead(self):
+        handlers, subscribers = self.register(self.failing)
+        worker = outbox.Worker(max_attempts=2, backoff=10)
+        with handlers, subscribers:
+            outbox.emit("test.topic", {"n": 1})
+            self.assertEqual(worker.drain(), {outbox.OUTCOME_RETRY: 1})
+            event = OutboxEvent.objects.get()
+            self.assertGreater(event.available_at, timezone.now())
+            self.assertIn("RuntimeError: boom 1", event.last_error)
+            self.assertEqual(worker.drain(), {})
+
+            OutboxEvent.objects.update(available_at=timezone.now())
+            self.assertEqual(worker.drain(), {outbox.OUTCOME_DEAD: 1})
+            self.assertEqual(OutboxEvent.objects.get().status, OutboxEvent.STATUS_DEAD)
+
+        call_command("run_outbox_worker", "--requeue-dead", stdout=StringIO())
+        event = OutboxEvent.objects.get()
+        self.assertEqual((event.status, event.attempts), ("pending", 0))
+
+    def test_handler_metrics(self):
+        outbox.emit(STATUS_CHANGED, {"id": 1})
+        self.drain_outbox()
+        self.assertIn(
+            'outbox_event_lag_seconds_count{handler="orders.handlers.broadcast_status",'
+            'outcome="done"}',
+            exposition(outbox.HISTOGRAMS),
+        )
+
+
+class OutboxWorkerCommandTests(TransactionTestCase):
+    def test_thread_pool_drains_the_outbox(self):
+        seen = []
+        lock = threading.Lock()
+
+        def record(payload):
+            with lock:
+                seen.append(payload["n"])
+
+        with (
+            mock.patch.dict(outbox.HANDLERS, {"test.handler": record}),
+            mock.patch.dict(outbox.SUBSCRIBERS, {"test.topic": ["test.handler"]}),
+        ):
+            for n in range(25):
+                outbox.emit("test.topic", {"n": n})
+            out = StringIO()
+            # The shared in-memory test database can refuse a thread's
+            # transaction outright; those events are retried at once.
+            call_command(
+                "run_outbox_worker",
+                "--once",
+                "--workers",
+                "3",
+                "--batch-size",
+                "10",
+                "--backoff",
+                "0",
+                "--max-attempts",
+                "20",
+                stdout=out,
+            )
+        stats = json.loads(out.getvalue().splitlines()[-1])
+        self.assertEqual(set(seen), set(range(25)))
+        self.assertEqual((stats["done"], stats["due"]), (25, 0))
+        self.assertFalse(OutboxEvent.objects.exists())
+
+
+class OrderStreamLoadTestCommandTests(OrderTestMixin, TransactionTestCase):
+    def setUp(self):
+        self.create_users()
+
+    def test_every_watcher_receives_the_event(self):
+        (product,) = self.make_products(1)
+        order = self.create_order([{"product_id": product.pk, "quantity": 1}])
+        out = StringIO()
+        call_command(
+            "order_stream_load_test",
+            "--order",
+            str(order.pk),
+            "--watchers",
+            "50",
+            "--host",
+            "testserver",
+            "--timeout",
+            "10",
+            stdout=out,
+        )
+        report = json.loads(out.getvalue())
+        self.assertEqual(report["connected"], 50)
+        self.assertEqual(report["delivered"], 50)
+        self.assertEqual(report["left_subscribed"], 0)
+
+
+class SeedMarketplaceTests(TestCase):
+    def seed(self, prefix, seed=7):
+        call_command(
+            "seed_marketplace",
+            users=30,
+            sellers=3,
+            categories=4,
+            products=40,
+            items=200,
+            review_rate=0.5,
+            batch_size=25,
+            prefix=prefix,
+            seed=seed,
+            stdout=StringIO(),
+        )
+        return Product.objects.filter(seller__username__startswith=f"{prefix}-")
+
+    def test_seeds_consistent_counters(self):
+        products = self.seed("a")
+        self.assertEqual(products.count(), 40)
+        self.assertEqual(OrderItem.objects.filter(product__in=products).count(), 200)
+        self.assertEqual(
+            committed_quantities(),
+            dict(products.filter(reserved__gt=0).values_list("pk", "reserved")),
+        )
+        self.assertTrue(VerifiedPurchase.objects.exists())
+        self.assertEqual(
+            sum(products.values_list("rating_count", flat=True)),
+            Review.objects.count(),
+        )
+        self.assertTrue(User.objects.get(username="a-user-10").check_password("pass"))
+
+    def test_same_seed_same_data(self):
+        fields = ("name", "price", "stock", "reserved", "rating_count")
+        first = list(self.seed("a").order_by("pk").values_list(*fields))
+        second = list(self.seed("b").order_by("pk").values_list(*fields))
+        other = list(self.seed("c", seed=8).order_by("pk").values_list(*fields))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+
+    def test_refuses_existing_prefix(self):
+        self.seed("a")
+        with self.assertRaises(CommandError):
+            self.seed("a")
+
+
+class MarketplaceLoadTestCommandTests(TransactionTestCase):
+    def setUp(self):
+        call_command(
+            "seed_marketplace",
+            users=10,
+            sellers=2,
+            categories=2,
+            products=20,
+            items=30,
+            prefix="lt",
+            stdout=StringIO(),
+        )
+
+    def load_test(self, **options):
+        out = StringIO()
+        call_command(
+            "marketplace_load_test",
+            prefix="lt",
+            host="testserver",
+            stdout=out,
+            **options,
+        )
+        return json.loads(out.getvalue())
+
+    def test_reports_every_route(self):
+        # The shared in-memory test database locks whole tables on write, so
+        # only the read mix runs concurrently here.
+        report = self.load_test(concurrency=1, requests=40)
+        self.assertEqual(report["requests"], 40)
+        self.assertEqual(report["errors"], 0, report)
+        self.assertFalse(report["throttled"])
+        self.assertEqual(set(report["routes"]), set(ROUTES))
+        for route in report["routes"].values():
+            if route["requests"]:
+                latency = route["latency_ms"]
+                self.assertLessEqual(latency["p50"], latency["p95"])
+                self.assertLessEqual(latency["p95"], latency["p99"])
+
+    def test_concurrent_reads(self):
+        report = self.load_test(
+            concurrency=3,
+            requests=30,
+            mix="products-list=1,products-detail=1,reviews-list=1,orders-list=1",
+        )
+        self.assertEqual(report["requests"], 30)
+        self.assertEqual(report["errors"], 0, report)
+        self.assertEqual(report["concurrency"], 3)
+
+    def test_rejects_unknown_route(self):
+        with self.assertRaises(CommandError):
+            call_command("marketplace_load_test", mix="nope=1")
+
+    def test_search_route_filters_the_catalog(self):
+        user = User.objects.get(username="lt-user-0")
+        client = APIClient()
+        client.force_authenticate(user)
+        method, path = ROUTES["products-search"]
+        word = Product.objects.order_by("pk").first().name.split()[1].lower()
+        results = getattr(client, method)(path.format(dish=word)).data["results"]
+        self.assertTrue(results)
+        self.assertLess(len(results), Product.objects.count())
+        self.assertTrue(all(word in row["name"].lower() for row in results))
+
+
+class OrderCreateRetryTests(OrderTestMixin, TransactionTestCase):
+    # atomic_with_retry only retries as the outermost transaction.
+    def setUp(self):
+        self.create_users()
+
+    def test_retried_create_keeps_the_target_customer(self):
+        (product,) = self.make_products(1)
+        admin = User.objects.create_user(
+            username="admin", password="pass", is_staff=True
+        )
+        request = APIRequestFactory().post("/api/orders/orders/")
+        request.user = admin
+        serializer = OrderCreateSerializer(
+            data={
+                "user_id": self.customer.pk,
+                "items": [{"product_id": product.pk, "quantity": 1}],
+            },
+            context={"request": request},
+        )
+        serializer.is_valid(raise_exception=True)
+        reserve = inventory.reserve
+        calls = []
+
+        def deadlock_once(quantities):
+            calls.append(quantities)
+            if len(calls) == 1:
+                raise OperationalError("deadlock detected")
+            return reserve(quantities)
+
+        with (
+            mock.patch("products.inventory.reserve", deadlock_once),
+            mock.patch("products.inventory.time.sleep"),
+        ):
+            order = serializer.save()
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(order.user, self.customer)
+
+
+class ConcurrentStockTests(OrderTestMixin, TransactionTestCase):
+    ORDERS = 200
+    STOCK = 50
+
+    def setUp(self):
+        self.create_users()
+
+    def test_concurrent_orders_never_oversell(self):
+        (product,) = self.make_products(1, stock=self.STOCK)
+        outcomes = []
+        lock = threading.Lock()
+
+        def place_order():
+            try:
+                self.create_order([{"product_id": product.pk, "quantity": 1}])
+                outcome = "created"
+            except serializers.ValidationError:
+                outcome = "rejected"
+            except OperationalError:
+                outcome = "failed"
+            finally:
+                connection.close()
+            with lock:
+                outcomes.append(outcome)
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            for _ in range(self.ORDERS):
+                pool.submit(place_order)
+
+        product.refresh_from_db()
+        created = outcomes.count("created")
+        self.assertEqual(len(outcomes), self.ORDERS)
+        self.assertGreaterEqual(product.stock, 0)
+        self.assertLessEqual(created, self.STOCK)
+        self.assertEqual(product.stock, self.STOCK - created)
+        self.assertEqual(OrderItem.objects.count(), created)
+
+
+class IdempotencyKeyTests(OrderTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+        self.first, self.second = self.make_products(2, stock=10, price="2.50")
+
+    def post_order(self, key, quantity=1):
+        return self.client.post(
+            "/api/orders/orders/",
+            {"items": [{"product_id": self.first.pk, "quantity": quantity}]},
+            format="json",
+            headers={"Idempotency-Key": key},
+        )
+
+    def test_retry_replays_create_without_running_it_again(self):
+        first = self.post_order("retry-1")
+        replay = self.post_order("retry-1")
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(replay.status_code, 201)
+        self.assertEqual(replay.json(), first.json())
+        self.assertNotIn("Idempotent-Replayed", first.headers)
+        self.assertEqual(replay.headers["Idempotent-Replayed"], "true")
+        self.assertEqual(Order.objects.count(), 1)
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.stock, 9)
+
+    def test_replays_do_not_spend_the_order_throttle(self):
+        for _ in range(8):
+            self.assertEqual(self.post_order("retry-1").status_code, 201)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_replay_survives_a_cache_flush(self):
+        first = self.post_order("retry-1")
+        cache.clear()
+        with self.assertNumQueries(1):
+            replay = self.post_order("retry-1")
+        self.assertEqual((replay.status_code, replay.json()), (201, first.json()))
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_reusing_a_key_for_another_request_is_refused(self):
+        self.post_order("retry-1")
+        response = self.post_order("retry-1", quantity=2)
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_keys_are_scoped_per_user(self):
+        other = User.objects.create_user(username="other", password="pass")
+        self.post_order("shared")
+        self.client.force_authenticate(other)
+        self.assertEqual(self.post_order("shared").status_code, 201)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_expired_key_runs_again(self):
+        self.post_order("retry-1")
+        IdempotencyKey.objects.update(expires_at=timezone.now())
+        cache.clear()
+        self.assertEqual(self.post_order("retry-1").status_code, 201)
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertEqual(IdempotencyKey.objects.count(), 1)
+
+    def test_invalid_key_is_rejected(self):
+        self.assertEqual(self.post_order("x" * 256).status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    def test_in_flight_duplicate_gets_a_conflict(self):
+        body = {"items": [{"product_id": self.first.pk, "quantity": 1}]}
+        request = APIRequestFactory().post("/api/orders/orders/", body, format="json")
+        request = Request(request, parsers=[JSONParser()])
+        request.user = self.customer
+        entry = Entry(request, "busy")
+        self.assertIsNone(entry.claim())
+        with self.settings(IDEMPOTENCY_WAIT=0):
+            response = self.post_order("busy")
+        self.assertEqual(response.status_code, 409)
+        entry.release()
+        self.assertEqual(self.post_order("busy").status_code, 201)
+
+    def test_only_matching_retries_skip_the_throttle(self):
+        order = self.create_order([{"product_id": self.first.pk, "quantity": 1}])
+        body = {"items": [{"product_id": self.first.pk, "quantity": 1}]}
+        request = APIRequestFactory().post("/api/orders/orders/", body, format="json")
+        request = Request(request, parsers=[JSONParser()])
+        request.user = self.customer
+        entry = Entry(request, "busy")
+        self.assertIsNone(entry.claim())
+        for quantity in range(2, 7):
+            self.post_order(f"fill-{quantity}", quantity=quantity)
+
+        with self.settings(IDEMPOTENCY_WAIT=0):
+            # A different body under the held key, and a view that does not
+            # honour keys at all, are both throttled.
+            self.assertEqual(self.post_order("busy", quantity=2).status_code, 429)
+            response = self.client.post(
+                f"/api/orders/orders/{order.pk}/items/batch/",
+                {"operations": []},
+                format="json",
+                headers={"Idempotency-Key": "busy"},
+            )
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(self.post_order("busy").status_code, 409)
+        entry.release()
+
+    def test_item_mutations_replay(self):
+        order = self.create_order(
+            [
+                {"product_id": self.first.pk, "quantity": 2},
+                {"product_id": self.second.pk, "quantity": 1},
+            ]
+        )
+        first_item, second_item = order.items.order_by("pk")
+        url = f"/api/orders/orders/{order.pk}/items/{first_item.pk}/quantity/"
+        for _ in range(2):
+            response = self.client.patch(
+                url, {"quantity": 5}, format="json", headers={"Idempotency-Key": "q"}
+            )
+            self.assertEqual(response.status_code, 200)
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.stock, 5)
+
+        url = f"/api/orders/orders/{order.pk}/items/{second_item.pk}/"
+        for _ in range(2):
+            response = self.client.delete(url, headers={"Idempotency-Key": "rm"})
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(order.items.count(), 1)
+
+        url = f"/api/orders/orders/{order.pk}/cancel/"
+        for _ in range(2):
+            response = self.client.post(url, headers={"Idempotency-Key": "c"})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data["status"], Order.STATUS_CANCELED)
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.stock, 10)
+
+    def test_purge_deletes_expired_keys(self):
+        self.post_order("old")
+        self.post_order("new", quantity=2)
+        IdempotencyKey.objects.filter(key="old").update(expires_at=timezone.now())
+        out = StringIO()
+        call_command("purge_idempotency_keys", "--batch-size", "1", stdout=out)
+        self.assertIn("Purged 1", out.getvalue())
+        self.assertEqual(
+            list(IdempotencyKey.objects.values_list("key", flat=True)), ["new"]
+        )
+
+
+class IdempotencyConcurrencyTests(OrderTestMixin, TransactionTestCase):
+    DUPLICATES = 8
+
+    def setUp(self):
+        cache.clear()
+        self.create_users()
+
+    def test_parallel_duplicates_run_once(self):
+        (product,) = self.make_products(1, stock=10)
+        executions = []
+        create = OrderCreateSerializer.create
+
+        def counted(serializer, validated_data):
+            executions.append(1)
+            # Keep the first request in flight while the duplicates arrive.
+            time.sleep(0.2)
+            return create(serializer, validated_data)
+
+        def post():
+            client = APIClient()
+            client.force_authenticate(self.customer)
+            try:
+                return client.post(
+                    "/api/orders/orders/",
+                    {"items": [{"product_id": product.pk, "quantity": 1}]},
+                    format="json",
+                    headers={"Idempotency-Key": "parallel"},
+                )
+            finally:
+                connection.close()
+
+        with (
+            mock.patch.object(OrderCreateSerializer, "create", counted),
+            ThreadPoolExecutor(max_workers=self.DUPLICATES) as pool,
+        ):
+            responses = list(pool.map(lambda _: post(), range(self.DUPLICATES)))
+
+        self.assertEqual(len(executions), 1)
+        self.assertEqual({response.status_code for response in responses}, {201})
+        self.assertEqual(len({response.data["id"] for response in responses}), 1)
+        replayed = [r for r in responses if "Idempotent-Replayed" in r.headers]
+        self.assertEqual(len(replayed), self.DUPLICATES - 1)
+        self.assertEqual(Order.objects.count(), 1)
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 9)
@@ -1,11 +1,14 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
-from orders.views import OrderViewSet
+from orders.streams import order_status_stream
+from orders.views import OrderViewSet, SellerSalesAPIView
 
 router = DefaultRouter()
 router.register(r"orders", OrderViewSet, basename="order")
 
 urlpatterns = [
+    path("orders/<int:pk>/events/", order_status_stream, name="order-status-stream"),
+    path("seller-sales/", SellerSalesAPIView.as_view(), name="seller-sales"),
     path("", include(router.urls)),
 ]
@@ -1,56 +1,172 @@
-from django.db import transaction
+from decimal import Decimal
+
+from django.db.models import Q, Sum
 from rest_framework import viewsets, mixins
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
-from rest_framework.throttling import ScopedRateThrottle
+from rest_framework.views import APIView
 from rest_framework import status as http_status
 
-from orders.models import Order, OrderItem
-from orders.permissions import IsOwnerOrAdmin
+from food_delivery.conditional import ConditionalGetMixin
+from food_delivery.pagination import KeysetPagination
+from food_delivery.readers import decimal_str
+from food_delivery.throttling import ScopedRateThrottle
+from orders import idempotency
+from orders.models import Order, OrderItem, SellerDailySales, SellerOrder
+from orders.permissions import IsOwnerOrAdmin, IsSeller
+from orders.readers import OrderRowSerializer, SellerQueueRowSerializer
+from orders.queue import sync_sellers
+from orders.rollups import item_change, record_sales
 from orders.serializers import (
     OrderCreateSerializer,
     OrderStatusUpdateSerializer,
     OrderSerializer,
     OrderItemQuantityUpdateSerializer,
+    OrderItemBatchSerializer,
+    SellerSalesQuerySerializer,
+)
+from orders.services import (
+    OrderEditError,
+    apply_item_operations,
+    apply_total_delta,
+    cancel_order,
 )
+from products import inventory
+
+
+class SellerQueuePagination(KeysetPagination):
+    # Pending before processing, oldest first: the queue index order.
+    ordering = ("status", "created_at", "order")
 
 
 class OrderViewSet(
+    ConditionalGetMixin,
     viewsets.GenericViewSet,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
     mixins.CreateModelMixin,
 ):
-    queryset = Order.objects.prefetch_related("items__product", "items").select_related(
-        "user"
-    )
+    queryset = Order.objects.select_related("user")
+    item_prefetch = ("items__product__category", "items__product__seller")
     permission_classes = [IsAuthenticated, IsOwnerOrAdmin]
     throttle_classes = [ScopedRateThrottle]
     throttle_scope = "orders"
 
+    def is_fast_read(self):
+        return self.action in ("list", "retrieve") and self.request.method in (
+            "GET",
+            "HEAD",
+        )
+
     def get_serializer_class(self):
         if self.action == "create":
             return OrderCreateSerializer
+        if self.is_fast_read():
+            return OrderRowSerializer
         return OrderSerializer
 
     def get_queryset(self):
         qs = super().get_queryset()
         user = self.request.user
-        return qs if user.is_staff else qs.filter(user=user)
+        if user.is_staff:
+            pass
+        elif self.action == "set_status" and getattr(user, "role", None) == "seller":
+            # Sellers move the orders in their queue, not just their own.
+            qs = qs.filter(
+                Q(user=user)
+                | Q(pk__in=SellerOrder.objects.filter(seller=user).values("order"))
+            )
+        else:
+            qs = qs.filter(user=user)
+        if self.is_fast_read():
+            qs = qs.values(*OrderRowSerializer.fields)
+        return qs
+
+    def get_validators(self, request):
+        if self.action != "retrieve":
+            return None, None
+        # One primary key lookup, scoped like get_queryset() so another
+        # user's order never answers 304; misses fall through to the 404.
+        qs = Order.objects.filter(pk=self.kwargs["pk"])
+        if not request.user.is_staff:
+            qs = qs.filter(user=request.user)
+        try:
+            updated_at = qs.values_list("updated_at", flat=True).first()
+        except (TypeError, ValueError):
+            return None, None
+        if updated_at is None:
+            return None, None
+        return updated_at.isoformat(), updated_at
+
+    def lock_order(self, order):
+        # Every stock-mutating path locks the order row before any product
+        # rows, so concurrent edits of one order serialize and never deadlock.
+        return Order.objects.select_for_update().get(pk=order.pk)
+
+    def order_response(self, order, status=http_status.HTTP_200_OK):
+        # Actions look orders up without their lines; the response refetches
+        # with the prefetches so lines, products, categories and sellers load
+        # in a fixed number of queries. The caller has already authorized
+        # ``order``, and the seller scope in get_queryset() no longer matches
+        # once the order leaves the seller's queue, so refetch unscoped.
+        order = self.queryset.prefetch_related(*self.item_prefetch).get(pk=order.pk)
+        data = OrderSerializer(order, context={"request": self.request}).data
+        return Response(data, status=status, headers=self.get_success_headers(data))
 
+    def check_throttles(self, request):
+        # A retry of a request that is running or already answered waits for
+        # or replays that response, so it does not spend the order quota.
+        handler = getattr(self, self.action or "", None)
+        if getattr(handler, "idempotent", False) and idempotency.is_duplicate(request):
+            return
+        super().check_throttles(request)
+
+    @idempotency.idempotent
     def create(self, request, *args, **kwargs):
         write_serializer = self.get_serializer(
             data=request.data, context={"request": request}
         )
         write_serializer.is_valid(raise_exception=True)
         order = write_serializer.save()
+        return self.order_response(order, status=http_status.HTTP_201_CREATED)
 
-        read_serializer = OrderSerializer(order, context={"request": request})
-        headers = self.get_success_headers(read_serializer.data)
-        return Response(
-            read_serializer.data, status=http_status.HTTP_201_CREATED, headers=headers
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path="queue",
+        permission_classes=[IsAuthenticated, IsSeller],
+        throttle_scope="seller_queue",
+    )
+    def queue(self, request):
+        """
+        Open orders holding the seller's products, showing only the seller's
+        lines; ``?status=pending`` or ``?status=processing`` narrows it.
+        """
+        entries = SellerOrder.objects.filter(seller=request.user)
+        status = request.query_params.get("status")
+        if status is not None:
+            if status not in SellerOrder.QUEUE_STATUSES:
+                return Response(
+                    {"detail": "status must be pending or processing."},
+                    status=http_status.HTTP_400_BAD_REQUEST,
+                )
+            entries = entries.filter(status=status)
+        paginator = SellerQueuePagination()
+        page = paginator.paginate_queryset(
+            entries.values("order", "status", "created_at"), request, view=self
+        )
+        orders = {
+            row["id"]: row
+            for row in Order.objects.filter(
+                pk__in=[entry["order"] for entry in page]
+            ).values(*OrderRowSerializer.fields)
+        }
+        rows = [orders[entry["order"]] for entry in page if entry["order"] in orders]
+        serializer = SellerQueueRowSerializer(
+            rows, many=True, context={"seller": request.user.pk}
         )
+        return paginator.get_paginated_response(serializer.data)
 
     @action(
         detail=True,
@@ -58,6 +174,7 @@ class OrderViewSet(
         url_path="status",
         permission_classes=[IsAuthenticated],
     )
+    @inventory.atomic_with_retry
     def set_status(self, request, pk=None):
         order = self.get_object()
         if not (
@@ -72,7 +189,7 @@ class OrderViewSet(
         )
         serializer.is_valid(raise_exception=True)
         serializer.save()
-        return Response(OrderSerializer(order).data, status=http_status.HTTP_200_OK)
+        return self.order_response(order)
 
     @action(
         detail=True,
@@ -80,6 +197,8 @@ class OrderViewSet(
         url_path="cancel",
         permission_classes=[IsAuthenticated],
     )
+    @idempotency.idempotent
+    @inventory.atomic_with_retry
     def cancel(self, request, pk=None):
         order = self.get_object()
         if order.user != request.user and not request.user.is_staff:
@@ -87,14 +206,14 @@ class OrderViewSet(
                 {"detail": "You can only cancel your own order"},
                 status=http_status.HTTP_403_FORBIDDEN,
             )
+        order = self.lock_order(order)
         if order.status != Order.STATUS_PENDING:
             return Response(
                 {"detail": "Only pending orders can be canceled"},
                 status=http_status.HTTP_400_BAD_REQUEST,
             )
-        order.status = Order.STATUS_CANCELED
-        order.save(update_fields=["status"])
-        return Response(OrderSerializer(order).data, status=http_status.HTTP_200_OK)
+        cancel_order(order)
+        return self.order_response(order)
 
     @action(
         detail=True,
@@ -102,7 +221,8 @@ class OrderViewSet(
         url_path=r"items/(?P<item_id>[^/.]+)",
         permission_classes=[IsAuthenticated],
     )
-    @transaction.atomic
+    @idempotency.idempotent
+    @inventory.atomic_with_retry
     def remove_item(self, request, pk=None, item_id=None):
         order = self.get_object()
 
@@ -111,6 +231,7 @@ class OrderViewSet(
                 {"detail": "You can only modify your own order."},
                 status=http_status.HTTP_403_FORBIDDEN,
             )
+        order = self.lock_order(order)
         if order.status != Order.STATUS_PENDING:
             return Response(
                 {"detail": "Only pending orders can be modified."},
@@ -133,17 +254,18 @@ class OrderViewSet(
                 status=http_status.HTTP_400_BAD_REQUEST,
             )
 
-        product = item.product
-        product.stock += item.quantity
-        product.save(update_fields=["stock"])
-
+        inventory.release({item.product_id: item.quantity})
         item.delete()
+        apply_total_delta(order, -item.line_total)
+        # The order only leaves the product's order count with its last line.
+        last_line = not order.items.filter(product=item.product_id).exists()
+        record_sales(
+            order, item_change(item, -item.quantity, orders=-1 if last_line else 0)
+        )
+        if last_line:
+            sync_sellers(order)
 
-        total = sum(oi.price * oi.quantity for oi in order.items.all())
-        order.total_price = total
-        order.save(update_fields=["total_price"])
-
-        return Response(OrderSerializer(order).data, status=http_status.HTTP_200_OK)
+        return self.order_response(order)
 
     @action(
         detail=True,
@@ -151,7 +273,8 @@ class OrderViewSet(
         url_path=r"items/(?P<item_id>[^/.]+)/quantity",
         permission_classes=[IsAuthenticated],
     )
-    @transaction.atomic
+    @idempotency.idempotent
+    @inventory.atomic_with_retry
     def update_item_quantity(self, request, pk=None, item_id=None):
         order = self.get_object()
 
@@ -160,6 +283,7 @@ class OrderViewSet(
                 {"detail": "You can only modify your own order."},
                 status=http_status.HTTP_403_FORBIDDEN,
             )
+        order = self.lock_order(order)
         if order.status != Order.STATUS_PENDING:
             return Response(
                 {"detail": "Only pending orders can be modified."},
@@ -178,30 +302,116 @@ class OrderViewSet(
         serializer.is_valid(raise_exception=True)
         new_qty = serializer.validated_data["quantity"]
 
-        current_qty = item.quantity
-        delta = new_qty - current_qty
-        product = item.product
-
-        if delta > 0:
-            product.refresh_from_db()
-            if product.stock < delta:
-                return Response(
-                    {
-                        "detail": f"Insufficient stock for '{product.name}'. Available: {product.stock}"
-                    },
-                    status=http_status.HTTP_400_BAD_REQUEST,
-                )
-            product.stock -= delta
-            product.save(update_fields=["stock"])
-        elif delta < 0:
-            product.stock += -delta
-            product.save(update_fields=["stock"])
+        delta = new_qty - item.quantity
+        try:
+            inventory.adjust({item.product_id: delta})
+        except inventory.InsufficientStock as exc:
+            return Response(
+                {"detail": str(exc)}, status=http_status.HTTP_400_BAD_REQUEST
+            )
 
         item.quantity = new_qty
         item.save(update_fields=["quantity"])
+        apply_total_delta(order, item.price * delta)
+        record_sales(order, item_change(item, delta))
 
-        total = sum(oi.price * oi.quantity for oi in order.items.all())
-        order.total_price = total
-        order.save(update_fields=["total_price"])
+        return self.order_response(order)
 
-        return Response(OrderSerializer(order).data, status=http_status.HTTP_200_OK)
+    @action(
+        detail=True,
+        methods=["post"],
+        url_path="items/batch",
+        permission_classes=[IsAuthenticated],
+    )
+    @inventory.atomic_with_retry
+    def batch_items(self, request, pk=None):
+        order = self.get_object()
+
+        if order.user != request.user and not request.user.is_staff:
+            return Response(
+                {"detail": "You can only modify your own order."},
+                status=http_status.HTTP_403_FORBIDDEN,
+            )
+
+        serializer = OrderItemBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        order = self.lock_order(order)
+        if order.status != Order.STATUS_PENDING:
+            return Response(
+                {"detail": "Only pending orders can be modified."},
+                status=http_status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            apply_item_operations(order, serializer.validated_data["operations"])
+        except (OrderEditError, inventory.InsufficientStock) as exc:
+            return Response(
+                {"detail": str(exc)}, status=http_status.HTTP_400_BAD_REQUEST
+            )
+
+        return self.order_response(order)
+
+
+class SellerSalesAPIView(APIView):
+    """
+    A seller's units, revenue and orders between ``start`` and ``end``
+    (inclusive), per day and for their top ``limit`` products by revenue.
+
+    Sums ``SellerDailySales`` rows, so the cost follows the number of days
+    and products in the range rather than the number of order lines. Day
+    and total ``orders`` count an order once per product it contains.
+    """
+
+    permission_classes = [IsAuthenticated, IsSeller | IsAdminUser]
+
+    def get(self, request):
+        query = SellerSalesQuerySerializer(
+            data=request.query_params, context={"request": request}
+        )
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+        rows = SellerDailySales.objects.filter(
+            seller=params["seller"], day__range=(params["start"], params["end"])
+        ).order_by()
+        sums = {
+            "units": Sum("units"),
+            "revenue": Sum("revenue"),
+            "orders": Sum("orders"),
+        }
+        days = list(rows.values("day").annotate(**sums).order_by("day"))
+        products = list(
+            rows.values("product", "product__name")
+            .annotate(**sums)
+            .order_by("-revenue", "product")[: params["limit"]]
+        )
+
+        def totals(row):
+            return {
+                "units": row["units"] or 0,
+                "revenue": decimal_str(row["revenue"] or Decimal("0")),
+                "orders": row["orders"] or 0,
+            }
+
+        return Response(
+            {
+                "seller": params["seller"],
+                "start": params["start"],
+                "end": params["end"],
+                "totals": totals(
+                    {
+                        field: sum(day[field] for day in days)
+                        for field in ("units", "revenue", "orders")
+                    }
+                ),
+                "days": [{"day": day["day"], **totals(day)} for day in days],
+                "products": [
+                    {
+                        "product": row["product"],
+                        "product_name": row["product__name"],
+                        **totals(row),
+                    }
+                    for row in products
+                ],
+            }
+        )
@@ -10,6 +10,23 @@ class CategoryAdmin(admin.ModelAdmin):
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ("id", "name", "price", "stock", "category", "seller", "created_at")
+    list_display = (
+        "id",
+        "name",
+        "price",
+        "stock",
+        "reserved",
+        "category",
+        "seller",
+        "created_at",
+    )
     list_filter = ("category", "seller")
     search_fields = ("name", "description")
+    readonly_fields = ("reserved", "rating_count", "rating_sum", *Product.RATING_FIELDS)
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            return super().save_model(request, obj, form, change)
+        # Only the edited fields, so concurrent F() updates to the counters
+        # are not written back over.
+        obj.save(update_fields=[*form.changed_data, "updated_at"])
@@ -0,0 +1,125 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+STATS_KEYS = ("hits", "misses")
+
+
+def get_cache():
+    return caches[settings.CATALOG_CACHE_ALIAS]
+
+
+def _version_key(model):
+    return f"catalog:version:{model._meta.label_lower}"
+
+
+def _new_version():
+    # Seeded from the clock so a counter that was evicted can never restart
+    # at a number some still-cached entry was stored under.
+    return time.time_ns()
+
+
+def get_version(model):
+    cache = get_cache()
+    key = _version_key(model)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(model):
+    """
+    Invalidate every cached response built from ``model``, after commit.
+
+    Bumping before commit would let a concurrent reader cache pre-commit
+    rows under the new version.
+    """
+
+    def bump():
+        cache = get_cache()
+        try:
+            cache.incr(_version_key(model))
+        except ValueError:
+            cache.set(_version_key(model), _new_version(), timeout=None)
+
+    transaction.on_commit(bump)
+
+
+def _count(stat):
+    cache = get_cache()
+    key = f"catalog:stats:{stat}"
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+def stats():
+    cache = get_cache()
+    values = cache.get_many([f"catalog:stats:{stat}" for stat in STATS_KEYS])
+    return {stat: values.get(f"catalog:stats:{stat}", 0) for stat in STATS_KEYS}
+
+
+class CachedResponseMixin:
+    """
+    Read-through cache for ``list`` and ``retrieve`` on catalog viewsets.
+
+    Entries are keyed on the request path and query string plus the current
+    version of every model in ``cache_models``; writes bump a version instead
+    of deleting keys, and old entries age out through the backend's TTL and
+    LRU eviction.
+    """
+
+    cache_models = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.cached(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached(request, super().retrieve, *args, **kwargs)
+
+    async def alist(self, request, *args, **kwargs):
+        return await self.acached(request, super().alist, *args, **kwargs)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return await self.acached(request, super().aretrieve, *args, **kwargs)
+
+    def get_cache_key(self, request):
+        versions = ":".join(str(get_version(model)) for model in self.cache_models)
+        query = sorted(request.query_params.lists())
+        raw = f"{request.path}|{query}|{request.accepted_renderer.format}"
+        digest = hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest()
+        return f"catalog:response:{versions}:{digest}"
+
+    def cached(self, request, view, *args, **kwargs):
+        cache = get_cache()
+        key = self.get_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            _count("hits")
+            return Response(data)
+        _count("misses")
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, timeout=settings.CATALOG_CACHE_TTL)
+        return response
+
+    async def acached(self, request, view, *args, **kwargs):
+        cache = get_cache()
+        key = self.get_cache_key(request)
+        data = await cache.aget(key)
+        if data is not None:
+            _count("hits")
+            return Response(data)
+        _count("misses")
+        response = await view(request, *args, **kwargs)
+        if response.status_code == 200:
+            await cache.aset(key, response.data, timeout=settings.CATALOG_CACHE_TTL)
+        return response
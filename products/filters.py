@@ -0,0 +1,138 @@
+import hashlib
+import re
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db.models import Case, CharField, Count, Q, Value, When
+from rest_framework.exceptions import ValidationError
+
+from products.cache import get_cache, get_version
+from products.models import Category
+
+# (label, lower bound inclusive, upper bound exclusive or None)
+PRICE_BANDS = [
+    ("0-10", Decimal("0"), Decimal("10")),
+    ("10-25", Decimal("10"), Decimal("25")),
+    ("25-50", Decimal("25"), Decimal("50")),
+    ("50-100", Decimal("50"), Decimal("100")),
+    ("100+", Decimal("100"), None),
+]
+FILTER_PARAMS = ("category", "seller", "min_price", "max_price", "in_stock", "q")
+TRUE_VALUES = {"1", "true", "yes"}
+FALSE_VALUES = {"0", "false", "no"}
+
+
+def _decimal(params, name):
+    try:
+        value = Decimal(params[name])
+    except (InvalidOperation, ValueError):
+        value = None
+    if value is None or not value.is_finite():
+        raise ValidationError({name: "A valid number is required."})
+    return value
+
+
+def filter_products(qs, params):
+    if params.get("category"):
+        qs = qs.filter(category__slug=params["category"])
+    if params.get("seller"):
+        # str.isdigit() also passes digits int() rejects, such as "²".
+        if not re.fullmatch(r"[0-9]+", params["seller"]):
+            raise ValidationError({"seller": "A valid seller id is required."})
+        qs = qs.filter(seller_id=params["seller"])
+    if params.get("min_price"):
+        qs = qs.filter(price__gte=_decimal(params, "min_price"))
+    if params.get("max_price"):
+        qs = qs.filter(price__lte=_decimal(params, "max_price"))
+    if params.get("in_stock"):
+        value = params["in_stock"].lower()
+        if value in TRUE_VALUES:
+            qs = qs.filter(stock__gt=0)
+        elif value in FALSE_VALUES:
+            qs = qs.filter(stock=0)
+        else:
+            raise ValidationError({"in_stock": "Must be true or false."})
+    return qs
+
+
+def price_band():
+    whens = []
+    for label, low, high in PRICE_BANDS:
+        condition = Q(price__gte=low)
+        if high is not None:
+            condition &= Q(price__lt=high)
+        whens.append(When(condition, then=Value(label)))
+    return Case(*whens, output_field=CharField())
+
+
+def facet_rows(qs):
+    return (
+        qs.order_by()
+        .annotate(band=price_band(), available=Q(stock__gt=0))
+        .values("category__slug", "seller", "band", "available")
+        .annotate(count=Count("pk"))
+    )
+
+
+def fold_facets(rows):
+    facets = {
+        "category": defaultdict(int),
+        "seller": defaultdict(int),
+        "price": defaultdict(int),
+        "in_stock": defaultdict(int),
+    }
+    for row in rows:
+        facets["category"][row["category__slug"]] += row["count"]
+        facets["seller"][str(row["seller"])] += row["count"]
+        facets["price"][row["band"]] += row["count"]
+        facets["in_stock"]["true" if row["available"] else "false"] += row["count"]
+    return {name: dict(counts) for name, counts in facets.items()}
+
+
+def facet_counts(qs):
+    """
+    Count ``qs`` by category, seller, price band and stock in one query.
+
+    The rows are grouped on all four dimensions at once and folded into the
+    per-facet totals here, rather than issuing a COUNT per facet value.
+    """
+    return fold_facets(facet_rows(qs))
+
+
+async def afacet_counts(qs):
+    return fold_facets([row async for row in facet_rows(qs).aiterator()])
+
+
+def facet_cache_key(params):
+    filters = sorted((name, params.get(name, "")) for name in FILTER_PARAMS)
+    digest = hashlib.md5(str(filters).encode(), usedforsecurity=False).hexdigest()
+    return f"catalog:facets:{get_version(Category)}:{digest}"
+
+
+def cached_facet_counts(qs, params):
+    """
+    ``facet_counts`` cached per filter combination and category version.
+
+    Product writes (every order moves stock) deliberately do not invalidate
+    the entry; counts may lag by up to ``CATALOG_FACET_TTL`` seconds, which
+    keeps the browse sidebar off the database during busy periods. Paging
+    parameters are left out of the key so all pages share one entry.
+    """
+    key = facet_cache_key(params)
+    cache = get_cache()
+    facets = cache.get(key)
+    if facets is None:
+        facets = facet_counts(qs)
+        cache.set(key, facets, timeout=settings.CATALOG_FACET_TTL)
+    return facets
+
+
+async def acached_facet_counts(qs, params):
+    key = facet_cache_key(params)
+    cache = get_cache()
+    facets = await cache.aget(key)
+    if facets is None:
+        facets = await afacet_counts(qs)
+        await cache.aset(key, facets, timeout=settings.CATALOG_FACET_TTL)
+    return facets
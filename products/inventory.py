@@ -0,0 +1,139 @@
+import random
+import time
+from functools import wraps
+
+from django.db import OperationalError, transaction
+from django.db.models import Case, F, IntegerField, Q, When
+from django.utils import timezone
+
+from products.cache import bump_version
+from products.models import Product
+
+RETRY_ATTEMPTS = 3
+RETRY_BACKOFF = 0.05
+
+# SQLSTATE serialization_failure / deadlock_detected on PostgreSQL; SQLite
+# only reports lock contention through the error message.
+CONFLICT_SQLSTATES = {"40001", "40P01"}
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product, available):
+        self.product = product
+        self.available = available
+        super().__init__(
+            f"Insufficient stock for '{product.name}'. Available: {available}"
+        )
+
+
+def _is_conflict(exc):
+    cause = exc.__cause__
+    sqlstate = getattr(cause, "sqlstate", None) or getattr(cause, "pgcode", None)
+    if sqlstate in CONFLICT_SQLSTATES:
+        return True
+    message = str(exc).lower()
+    return "deadlock" in message or "locked" in message
+
+
+def atomic_with_retry(func):
+    """
+    Run ``func`` in a transaction, retrying it a bounded number of times when
+    the database aborts it with a deadlock or serialization failure.
+
+    Only the outermost call retries; inside an existing transaction the
+    failure has to propagate to whoever owns it.
+    """
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if transaction.get_connection().in_atomic_block:
+            return func(*args, **kwargs)
+        for attempt in range(1, RETRY_ATTEMPTS + 1):
+            try:
+                with transaction.atomic():
+                    return func(*args, **kwargs)
+            except OperationalError as exc:
+                if attempt == RETRY_ATTEMPTS or not _is_conflict(exc):
+                    raise
+                time.sleep(RETRY_BACKOFF * attempt * random.uniform(0.5, 1.5))
+
+    return wrapper
+
+
+@transaction.atomic
+def adjust(deltas):
+    """
+    Apply ``deltas`` ({product_id: qty}) to stock, all or nothing.
+
+    A positive delta takes units out of stock, a negative one puts them back.
+    ``reserved`` moves by the same amount in the other direction, so
+    ``stock + reserved`` stays constant and drift can be reconciled later.
+    Rows are locked in primary-key order so concurrent baskets touching the
+    same products cannot deadlock, and the change is a single conditional
+    UPDATE regardless of how many products are involved.
+    Returns the locked products keyed by id, with ``stock`` and ``reserved``
+    already updated.
+
+    The catalog cache is only invalidated when a product goes in or out of
+    stock, which changes ``in_stock`` filtering; otherwise the stock counts
+    it shows lag by up to ``CATALOG_CACHE_TTL`` seconds, so order traffic
+    does not empty the cache.
+    """
+    deltas = {pk: qty for pk, qty in deltas.items() if qty}
+    if not deltas:
+        return {}
+    products = {
+        product.pk: product
+        for product in Product.objects.select_for_update()
+        .filter(pk__in=deltas)
+        .order_by("pk")
+    }
+    for pk, qty in deltas.items():
+        product = products.get(pk)
+        if product is None:
+            raise Product.DoesNotExist(f"Product {pk} no longer exists.")
+        if product.stock < qty:
+            raise InsufficientStock(product, product.stock)
+
+    condition = Q()
+    stock_whens = []
+    reserved_whens = []
+    for pk, qty in deltas.items():
+        condition |= Q(pk=pk, stock__gte=qty) if qty > 0 else Q(pk=pk)
+        stock_whens.append(When(pk=pk, then=F("stock") - qty))
+        reserved_whens.append(When(pk=pk, then=F("reserved") + qty))
+    now = timezone.now()
+    updated = Product.objects.filter(condition).update(
+        stock=Case(*stock_whens, default=F("stock"), output_field=IntegerField()),
+        reserved=Case(
+            *reserved_whens, default=F("reserved"), output_field=IntegerField()
+        ),
+        updated_at=now,
+    )
+    if updated != len(deltas):
+        # Another writer got in between the read and the update on a backend
+        # without row locks; report whichever line actually came up short.
+        current = dict(Product.objects.filter(pk__in=deltas).values_list("pk", "stock"))
+        short = next((pk for pk, qty in deltas.items() if current.get(pk, 0) < qty), pk)
+        raise InsufficientStock(products[short], current.get(short, 0))
+
+    crossed = False
+    for pk, qty in deltas.items():
+        product = products[pk]
+        crossed |= (product.stock > 0) != (product.stock - qty > 0)
+        product.stock -= qty
+        product.reserved += qty
+        product.updated_at = now
+    if crossed:
+        bump_version(Product)
+    return products
+
+
+def reserve(quantities):
+    """Take ``quantities`` ({product_id: qty}) out of stock, all or nothing."""
+    return adjust(quantities)
+
+
+def release(quantities):
+    """Put ``quantities`` ({product_id: qty}) back into stock."""
+    return adjust({pk: -qty for pk, qty in quantities.items()})
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from products import search
+
+
+class Command(BaseCommand):
+    help = "Create the product text index if needed and repopulate it."
+
+    def handle(self, *args, **options):
+        search.install()
+        search.rebuild()
+        self.stdout.write(self.style.SUCCESS("Product search index rebuilt."))
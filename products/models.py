@@ -1,3 +1,5 @@
+from decimal import Decimal
+
 from django.conf import settings
 from django.db import models
 
@@ -24,10 +26,50 @@ class Product(models.Model):
     description = models.TextField(blank=True, null=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     stock = models.PositiveIntegerField(default=0)
+    reserved = models.PositiveIntegerField(
+        default=0, help_text="Units committed to non-canceled orders."
+    )
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # Review aggregates, kept in step by reviews.ratings.
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
+
+    RATING_FIELDS = ["rating_1", "rating_2", "rating_3", "rating_4", "rating_5"]
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="product_created_idx"),
+            models.Index(
+                fields=["category", "-created_at", "-id"],
+                name="product_category_created_idx",
+            ),
+            models.Index(
+                fields=["seller", "-created_at", "-id"],
+                name="product_seller_created_idx",
+            ),
+            models.Index(fields=["updated_at"], name="product_updated_idx"),
+        ]
 
     def __str__(self):
         return self.name
+
+    @property
+    def rating_avg(self):
+        if not self.rating_count:
+            return None
+        return (Decimal(self.rating_sum) / self.rating_count).quantize(Decimal("0.01"))
+
+    @property
+    def rating_histogram(self):
+        return {
+            str(star): getattr(self, field)
+            for star, field in enumerate(self.RATING_FIELDS, start=1)
+        }
@@ -0,0 +1,48 @@
+from decimal import Decimal
+
+from food_delivery.readers import RowSerializer, datetime_str, decimal_str
+from products.models import Product
+
+
+class ProductRowSerializer(RowSerializer):
+    """Fast path for ``ProductSerializer`` on the catalog listing."""
+
+    fields = (
+        "id",
+        "name",
+        "description",
+        "price",
+        "stock",
+        "category__id",
+        "category__name",
+        "category__slug",
+        "seller",
+        "created_at",
+        "rating_count",
+        "rating_sum",
+        *Product.RATING_FIELDS,
+    )
+
+    def to_representation(self, row):
+        count = row["rating_count"]
+        avg = (Decimal(row["rating_sum"]) / count) if count else None
+        return {
+            "id": row["id"],
+            "name": row["name"],
+            "description": row["description"],
+            "price": decimal_str(row["price"]),
+            "stock": row["stock"],
+            "category": {
+                "id": row["category__id"],
+                "name": row["category__name"],
+                "slug": row["category__slug"],
+            },
+            "seller": row["seller"],
+            "created_at": datetime_str(row["created_at"]),
+            "rating_avg": decimal_str(avg),
+            "rating_count": count,
+            "rating_histogram": {
+                str(star): row[field]
+                for star, field in enumerate(Product.RATING_FIELDS, start=1)
+            },
+        }
@@ -0,0 +1,112 @@
+"""
+Full-text product search.
+
+SQLite keeps a standalone FTS5 table keyed by product id, maintained from
+the Product save/delete signals. PostgreSQL uses a GIN index over the same
+``to_tsvector`` expression the search query filters on, which the database
+keeps current by itself. Other backends fall back to ``icontains``.
+"""
+
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from products.models import Product
+
+FTS_TABLE = "products_product_fts"
+PG_INDEX = "product_search_idx"
+PG_CONFIG = "english"
+PG_DOCUMENT = "to_tsvector('english', name || ' ' || coalesce(description, ''))"
+
+TERM = re.compile(r"\w+", re.UNICODE)
+
+
+def terms(query):
+    return TERM.findall(query.lower())
+
+
+def install(**kwargs):
+    """Create the text index if it is missing; connected to post_migrate."""
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+                [FTS_TABLE],
+            )
+            if cursor.fetchone():
+                return
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(name, description)"
+            )
+            rebuild()
+        elif connection.vendor == "postgresql":
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {PG_INDEX} ON {Product._meta.db_table} "
+                f"USING GIN ({PG_DOCUMENT})"
+            )
+
+
+def rebuild():
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, name, description) "
+            f"SELECT id, name, coalesce(description, '') "
+            f"FROM {Product._meta.db_table}"
+        )
+
+
+def index_product(product):
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [product.pk])
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, name, description) VALUES (%s, %s, %s)",
+            [product.pk, product.name, product.description or ""],
+        )
+
+
+def unindex_product(product_id):
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [product_id])
+
+
+def search(query, limit):
+    """
+    Return up to ``limit`` product ids matching ``query``, best match first.
+
+    Every term must match, and the last characters typed match as a prefix.
+    """
+    words = terms(query)
+    if not words:
+        return []
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            match = " ".join(f'"{word}"*' for word in words)
+            # bm25 is lower-is-better; weight name hits above description.
+            cursor.execute(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+                f"ORDER BY bm25({FTS_TABLE}, 10.0, 1.0) LIMIT %s",
+                [match, limit],
+            )
+        elif connection.vendor == "postgresql":
+            tsquery = " & ".join(f"{word}:*" for word in words)
+            cursor.execute(
+                f"SELECT id FROM {Product._meta.db_table} "
+                f"WHERE {PG_DOCUMENT} @@ to_tsquery(%s, %s) "
+                f"ORDER BY ts_rank({PG_DOCUMENT}, to_tsquery(%s, %s)) DESC, id DESC "
+                f"LIMIT %s",
+                [PG_CONFIG, tsquery, PG_CONFIG, tsquery, limit],
+            )
+        else:
+            qs = Product.objects.all()
+            for word in words:
+                qs = qs.filter(Q(name__icontains=word) | Q(description__icontains=word))
+            return list(qs.values_list("pk", flat=True)[:limit])
+        return [row[0] for row in cursor.fetchall()]
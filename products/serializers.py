@@ -1,21 +1,30 @@
 from encodings.punycode import selective_find
 
 from rest_framework import serializers
+
+from food_delivery.metrics import TimedSerializerMixin
 from products.models import Category, Product
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = ["id", "name", "slug"]
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
     category_id = serializers.PrimaryKeyRelatedField(
         queryset=Category.objects.all(), source="category", write_only=True
     )
 
+    rating_avg = serializers.DecimalField(
+        max_digits=3, decimal_places=2, read_only=True
+    )
+    rating_histogram = serializers.DictField(
+        child=serializers.IntegerField(), read_only=True
+    )
+
     class Meta:
         model = Product
         fields = [
@@ -28,8 +37,11 @@ class ProductSerializer(serializers.ModelSerializer):
             "category_id",
             "seller",
             "created_at",
+            "rating_avg",
+            "rating_count",
+            "rating_histogram",
         ]
-        read_only_fields = ["id", "seller", "created_at"]
+        read_only_fields = ["id", "seller", "created_at", "rating_count"]
 
     def validate_price(self, value):
         if value < 0:
@@ -44,3 +56,11 @@ class ProductSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         validated_data["seller"] = self.context["request"].user
         return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        # Write only what was sent: reviews and orders move the counters
+        # with F() expressions while this request runs.
+        instance.save(update_fields=[*validated_data, "updated_at"])
+        return instance
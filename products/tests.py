@@ -1,3 +1,406 @@
-from django.test import TestCase
+import base64
+import json
+from decimal import Decimal
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F
+from django.test import AsyncClient, RequestFactory, SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from food_delivery.db import ReplicaReadMiddleware, ReplicaRouter
+from food_delivery.testing import QueryPlanAssertionsMixin
+from products import cache as catalog_cache
+from products import inventory
+from products.filters import cached_facet_counts, facet_counts
+from products.models import Category, Product
+from products.serializers import ProductSerializer
+
+
+class ProductTestMixin:
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user(
+            username="seller", password="pass", role=User.ROLE_SELLER
+        )
+        cls.category = Category.objects.create(name="Pizza", slug="pizza")
+
+    def setUp(self):
+        cache.clear()
+        catalog_cache.get_cache().clear()
+        self.client = APIClient()
+
+    def make_products(self, count, **kwargs):
+        fields = {"price": Decimal("5.00"), "stock": 10, **kwargs}
+        return [
+            Product.objects.create(
+                seller=self.seller,
+                category=fields.get("category", self.category),
+                name=fields.get("name", f"Product {i}"),
+                price=fields["price"],
+                stock=fields["stock"],
+            )
+            for i in range(count)
+        ]
+
+
+class KeysetPaginationTests(ProductTestMixin, TestCase):
+    def test_pages_walk_forward_and_back_across_equal_timestamps(self):
+        products = self.make_products(7)
+        # Equal timestamps force the id tiebreaker to do the work.
+        Product.objects.update(created_at=timezone.now())
+        expected = sorted(product.pk for product in products)[::-1]
+
+        seen = []
+        pages = []
+        url = "/api/products/products/?page_size=3"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(row["id"] for row in response.data["results"])
+            pages.append(response.data)
+            url = response.data["next"]
+        self.assertEqual(seen, expected)
+        self.assertIsNone(pages[0]["previous"])
+
+        response = self.client.get(pages[-1]["previous"])
+        self.assertEqual(
+            [row["id"] for row in response.data["results"]],
+            [row["id"] for row in pages[-2]["results"]],
+        )
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get("/api/products/products/?cursor=bogus")
+        self.assertEqual(response.status_code, 404)
+        for position in ([{"a": 1}, 1], [[1], 1], ["2024-01-01", "x"], [1.5e400, 1]):
+            payload = json.dumps({"r": 0, "p": position}).encode()
+            cursor = base64.urlsafe_b64encode(payload).decode()
+            response = self.client.get("/api/products/products/", {"cursor": cursor})
+            self.assertEqual(response.status_code, 404, position)
+
+
+class ProductQueryPlanTests(ProductTestMixin, QueryPlanAssertionsMixin, TestCase):
+    def test_catalog_listing_uses_index(self):
+        self.assertUsesIndex(
+            Product.objects.order_by("-created_at", "-id")[:20], "product_created_idx"
+        )
+
+    def test_category_listing_uses_index(self):
+        self.assertUsesIndex(
+            Product.objects.filter(category=self.category).order_by(
+                "-created_at", "-id"
+            )[:20],
+            "product_category_created_idx",
+        )
+
+    def test_seller_listing_uses_index(self):
+        self.assertUsesIndex(
+            Product.objects.filter(seller=self.seller).order_by("-created_at", "-id")[
+                :20
+            ],
+            "product_seller_created_idx",
+        )
+
+
+class CatalogCacheTests(ProductTestMixin, TestCase):
+    def test_repeat_reads_are_served_from_cache(self):
+        self.make_products(3)
+        url = "/api/products/products/"
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(catalog_cache.stats(), {"hits": 1, "misses": 1})
+
+    def test_query_parameters_are_part_of_the_key(self):
+        self.make_products(3)
+        self.client.get("/api/products/products/?page_size=1")
+        response = self.client.get("/api/products/products/?page_size=2")
+        self.assertEqual(len(response.data["results"]), 2)
+
+    def test_writes_bump_the_version(self):
+        (product,) = self.make_products(1)
+        url = f"/api/products/products/{product.pk}/"
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            product.name = "Renamed"
+            product.save()
+        self.assertEqual(self.client.get(url).data["name"], "Renamed")
+
+        # Stock counts lag until a product goes in or out of stock.
+        with self.captureOnCommitCallbacks(execute=True):
+            inventory.reserve({product.pk: 4})
+        self.assertEqual(self.client.get(url).data["stock"], 10)
+        with self.captureOnCommitCallbacks(execute=True):
+            inventory.reserve({product.pk: 6})
+        self.assertEqual(self.client.get(url).data["stock"], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            inventory.release({product.pk: 1})
+        self.assertEqual(self.client.get(url).data["stock"], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.name = "Pasta"
+            self.category.save()
+        self.assertEqual(self.client.get(url).data["category"]["name"], "Pasta")
+
+
+class ProductSearchTests(ProductTestMixin, TestCase):
+    def search(self, query):
+        response = self.client.get("/api/products/products/", {"q": query})
+        self.assertEqual(response.status_code, 200)
+        return [row["name"] for row in response.data["results"]]
+
+    def test_search_ranks_and_matches_prefixes(self):
+        self.make_products(1, name="Garlic bread")
+        Product.objects.create(
+            seller=self.seller,
+            category=self.category,
+            name="Margherita",
+            description="Tomato, mozzarella and a hint of garlic",
+            price=Decimal("8.00"),
+        )
+        self.make_products(1, name="Pepperoni")
+
+        self.assertEqual(self.search("garl"), ["Garlic bread", "Margherita"])
+        self.assertEqual(self.search("mozz tomato"), ["Margherita"])
+        self.assertEqual(self.search("sushi"), [])
+
+    def test_facets_count_the_search_results(self):
+        self.make_products(1, name="Garlic bread")
+        self.make_products(2, name="Pepperoni")
+        response = self.client.get("/api/products/products/", {"q": "garlic"})
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(response.data["facets"]["category"], {"pizza": 1})
+
+    def test_index_follows_saves_and_deletes(self):
+        (product,) = self.make_products(1, name="Calzone")
+        self.assertEqual(self.search("calzone"), ["Calzone"])
+        with self.captureOnCommitCallbacks(execute=True):
+            product.name = "Stromboli"
+            product.save()
+        self.assertEqual(self.search("calzone"), [])
+        self.assertEqual(self.search("strom"), ["Stromboli"])
+        with self.captureOnCommitCallbacks(execute=True):
+            product.delete()
+        self.assertEqual(self.search("strom"), [])
+
+
+class ProductFilterTests(ProductTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        pasta = Category.objects.create(name="Pasta", slug="pasta")
+        self.make_products(2, price=Decimal("8.00"))
+        self.make_products(1, price=Decimal("30.00"), stock=0)
+        self.make_products(1, category=pasta, price=Decimal("12.00"))
+
+    def list(self, **params):
+        response = self.client.get("/api/products/products/", params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_filters(self):
+        self.assertEqual(len(self.list(category="pizza")["results"]), 3)
+        self.assertEqual(len(self.list(in_stock="true")["results"]), 3)
+        self.assertEqual(len(self.list(min_price="10", max_price="20")["results"]), 1)
+        self.assertEqual(len(self.list(seller=self.seller.pk)["results"]), 4)
+        for params in (
+            {"min_price": "abc"},
+            {"min_price": "NaN"},
+            {"max_price": "Infinity"},
+            {"seller": "²"},
+            {"seller": "-1"},
+        ):
+            response = self.client.get("/api/products/products/", params)
+            self.assertEqual(response.status_code, 400, params)
+
+    def test_facets_count_the_filtered_set(self):
+        facets = self.list(category="pizza")["facets"]
+        self.assertEqual(facets["category"], {"pizza": 3})
+        self.assertEqual(facets["seller"], {str(self.seller.pk): 3})
+        self.assertEqual(facets["price"], {"0-10": 2, "25-50": 1})
+        self.assertEqual(facets["in_stock"], {"true": 2, "false": 1})
+
+    def test_facets_are_one_grouped_query_and_cached(self):
+        qs = Product.objects.all()
+        with self.assertNumQueries(1):
+            facet_counts(qs)
+        params = {"in_stock": "true"}
+        cached_facet_counts(qs, params)
+        with self.assertNumQueries(0):
+            cached_facet_counts(qs, params)
+
+
+class ProductReadPathTests(ProductTestMixin, TestCase):
+    def test_list_matches_product_serializer(self):
+        products = self.make_products(3, price=Decimal("4.10"))
+        Product.objects.filter(pk=products[0].pk).update(
+            rating_count=3, rating_sum=13, rating_4=2, rating_5=1
+        )
+        expected = ProductSerializer(
+            Product.objects.order_by("-created_at", "-id"), many=True
+        ).data
+        response = self.client.get("/api/products/products/")
+        self.assertEqual(
+            JSONRenderer().render(response.data["results"]),
+            JSONRenderer().render(expected),
+        )
+
+    def test_list_query_count_is_independent_of_page_size(self):
+        self.make_products(12)
+        counts = []
+        for size in (2, 12):
+            catalog_cache.get_cache().clear()
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.get(f"/api/products/products/?page_size={size}")
+            counts.append(len(ctx))
+        self.assertEqual(counts[0], counts[1])
+
+
+class ProductWriteTests(ProductTestMixin, TestCase):
+    def test_update_keeps_concurrent_counter_changes(self):
+        (product,) = self.make_products(1)
+        # A review and an order land after the instance is loaded.
+        Product.objects.filter(pk=product.pk).update(
+            rating_count=F("rating_count") + 1,
+            rating_sum=F("rating_sum") + 5,
+            rating_5=F("rating_5") + 1,
+            stock=F("stock") - 2,
+            reserved=F("reserved") + 2,
+        )
+        serializer = ProductSerializer(product, data={"price": "7.50"}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        product.refresh_from_db()
+        self.assertEqual(product.price, Decimal("7.50"))
+        self.assertEqual(
+            (product.rating_count, product.rating_sum, product.rating_5), (1, 5, 1)
+        )
+        self.assertEqual((product.stock, product.reserved), (8, 2))
+
+
+class CatalogConditionalGetTests(ProductTestMixin, TestCase):
+    def test_list_answers_304_until_a_product_sells_out(self):
+        (product,) = self.make_products(1)
+        url = "/api/products/products/"
+        etag = self.client.get(url).headers["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            inventory.reserve({product.pk: 2})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            inventory.reserve({product.pk: 8})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["results"][0]["stock"], 0)
+
+    def test_pages_get_distinct_etags(self):
+        self.make_products(3)
+        first = self.client.get("/api/products/products/?page_size=1")
+        second = self.client.get(first.data["next"])
+        self.assertNotEqual(first.headers["ETag"], second.headers["ETag"])
+
+    def test_delete_changes_the_list_etag(self):
+        products = self.make_products(2)
+        url = "/api/products/products/"
+        etag = self.client.get(url).headers["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            products[0].delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), 1)
+
+    def test_retrieve_validates_on_the_etag_alone(self):
+        (product,) = self.make_products(1)
+        url = f"/api/products/products/{product.pk}/"
+        response = self.client.get(url)
+        self.assertIn("Last-Modified", response.headers)
+        with self.captureOnCommitCallbacks(execute=True):
+            product.stock = 3
+            product.save()
+        response = self.client.get(
+            url,
+            HTTP_IF_MODIFIED_SINCE=response.headers["Last-Modified"],
+            HTTP_IF_NONE_MATCH=response.headers["ETag"],
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["stock"], 3)
+
+
+class AsyncReadPathTests(ProductTestMixin, TestCase):
+    def assertSameJSON(self, first, second):
+        self.assertEqual(JSONRenderer().render(first), JSONRenderer().render(second))
+
+    async def test_async_list_and_retrieve_match_sync_views(self):
+        products = await sync_to_async(self.make_products)(3)
+        client = AsyncClient()
+        for query in ("", "?page_size=2", "?q=product", "?in_stock=true"):
+            expected = await sync_to_async(self.client.get)(
+                f"/api/products/products/{query}"
+            )
+            response = await client.get(f"/api/products/async/products/{query}")
+            self.assertEqual(response.status_code, 200)
+            self.assertSameJSON(response.json()["results"], expected.data["results"])
+            self.assertEqual(response.json()["facets"], expected.data["facets"])
+
+        url = f"products/{products[0].pk}/"
+        expected = await sync_to_async(self.client.get)(f"/api/products/{url}")
+        response = await client.get(f"/api/products/async/{url}")
+        self.assertSameJSON(response.json(), expected.data)
+        response = await client.get("/api/products/async/categories/")
+        self.assertEqual(response.json()["results"][0]["slug"], "pizza")
+
+    async def test_async_views_keep_keyset_paging_and_validators(self):
+        await sync_to_async(self.make_products)(3)
+        client = AsyncClient()
+        first = await client.get("/api/products/async/products/?page_size=2")
+        second = await client.get(first.json()["next"])
+        self.assertEqual(len(second.json()["results"]), 1)
+        response = await client.get(
+            "/api/products/async/products/?page_size=2",
+            headers={"If-None-Match": first.headers["ETag"]},
+        )
+        self.assertEqual(response.status_code, 304)
+
+    async def test_async_views_are_read_only_and_404(self):
+        client = AsyncClient()
+        response = await client.get("/api/products/async/products/999/")
+        self.assertEqual(response.status_code, 404)
+        response = await client.post("/api/products/async/categories/", {})
+        self.assertIn(response.status_code, (401, 403, 405))
+
+
+class ReplicaRoutingTests(SimpleTestCase):
+    def route(self, method, path):
+        seen = {}
+
+        def get_response(request):
+            router = ReplicaRouter()
+            seen["product"] = router.db_for_read(Product)
+            seen["user"] = router.db_for_read(User)
+            return None
+
+        request = getattr(RequestFactory(), method)(path)
+        ReplicaReadMiddleware(get_response)(request)
+        return seen
+
+    def test_safe_catalog_reads_go_to_the_replica(self):
+        self.assertEqual(
+            self.route("get", "/api/products/products/"),
+            {"product": "replica", "user": None},
+        )
+
+    def test_writes_and_other_paths_stay_on_default(self):
+        self.assertEqual(self.route("post", "/api/products/products/")["product"], None)
+        self.assertEqual(self.route("get", "/api/orders/orders/")["product"], None)
+        self.assertIsNone(ReplicaRouter().db_for_read(Product))
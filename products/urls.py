@@ -1,11 +1,34 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from products.views import CategoryViewSet, ProductViewSet
+
+from food_delivery.async_views import async_read_view
+from products.views import CatalogCacheStatsView, CategoryViewSet, ProductViewSet
 
 router = DefaultRouter()
 router.register(r"categories", CategoryViewSet, basename="category")
 router.register(r"products", ProductViewSet, basename="product")
 
 urlpatterns = [
+    path("cache-stats/", CatalogCacheStatsView.as_view(), name="catalog-cache-stats"),
+    path(
+        "async/categories/",
+        async_read_view(CategoryViewSet, "list"),
+        name="category-async-list",
+    ),
+    path(
+        "async/categories/<int:pk>/",
+        async_read_view(CategoryViewSet, "retrieve"),
+        name="category-async-detail",
+    ),
+    path(
+        "async/products/",
+        async_read_view(ProductViewSet, "list"),
+        name="product-async-list",
+    ),
+    path(
+        "async/products/<int:pk>/",
+        async_read_view(ProductViewSet, "retrieve"),
+        name="product-async-detail",
+    ),
     path("", include(router.urls)),
 ]
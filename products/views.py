@@ -1,13 +1,51 @@
+from django.conf import settings
+from django.db.models import Case, IntegerField, Max, When
 from rest_framework.permissions import AllowAny, IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
+
+from food_delivery.async_views import AsyncReadMixin
+from food_delivery.conditional import ConditionalGetMixin
+from food_delivery.pagination import KeysetPagination, RankedPagination
+from products import cache, search
+from products.filters import (
+    acached_facet_counts,
+    cached_facet_counts,
+    filter_products,
+)
+from products.cache import CachedResponseMixin
 from products.models import Category, Product
 from products.permissions import IsSellerOrReadOnly
+from products.readers import ProductRowSerializer
 from products.serializers import CategorySerializer, ProductSerializer
 
 
-class CategoryViewSet(ModelViewSet):
+def catalog_stamp(version):
+    """
+    Newest product ``updated_at``, memoised under the catalog ``version``.
+
+    Every product write bumps the version, so repeat reads of an unchanged
+    catalog validate without touching the database.
+    """
+    store = cache.get_cache()
+    key = f"catalog:stamp:{version}"
+    stamp = store.get(key)
+    if stamp is None:
+        stamp = Product.objects.aggregate(stamp=Max("updated_at"))["stamp"]
+        store.set(key, stamp, timeout=settings.CATALOG_CACHE_TTL)
+    return stamp
+
+
+class CategoryPagination(KeysetPagination):
+    ordering = ("name", "id")
+
+
+class CategoryViewSet(CachedResponseMixin, AsyncReadMixin, ModelViewSet):
+    cache_models = (Category,)
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
+    pagination_class = CategoryPagination
 
     def get_permissions(self):
         if self.request.method in ["GET", "HEAD", "OPTIONS"]:
@@ -15,10 +53,98 @@ class CategoryViewSet(ModelViewSet):
         return [IsAdminUser()]
 
 
-class ProductViewSet(ModelViewSet):
+class ProductViewSet(
+    ConditionalGetMixin, CachedResponseMixin, AsyncReadMixin, ModelViewSet
+):
+    cache_models = (Product, Category)
     queryset = Product.objects.select_related("category", "seller").all()
     serializer_class = ProductSerializer
     permission_classes = [IsSellerOrReadOnly]
 
+    def get_validators(self, request):
+        # Deletes and category edits do not move any product's updated_at,
+        # so the cache versions ride along in the ETag.
+        categories = cache.get_version(Category)
+        if self.action == "list":
+            version = f"{cache.get_version(Product)}:{categories}"
+            stamp = catalog_stamp(version)
+            return f"{version}:{stamp}", stamp
+        if self.action == "retrieve":
+            try:
+                stamp = (
+                    Product.objects.filter(pk=self.kwargs["pk"])
+                    .values_list("updated_at", flat=True)
+                    .first()
+                )
+            except (TypeError, ValueError):
+                return None, None
+            if stamp is not None:
+                return f"{categories}:{stamp.isoformat()}", stamp
+        return None, None
+
+    def get_search_query(self):
+        if self.action != "list":
+            return ""
+        return self.request.query_params.get("q", "").strip()
+
+    @property
+    def paginator(self):
+        if self.get_search_query():
+            if not isinstance(getattr(self, "_paginator", None), RankedPagination):
+                self._paginator = RankedPagination()
+            return self._paginator
+        return super().paginator
+
+    def is_fast_read(self):
+        return self.action == "list" and self.request.method == "GET"
+
+    def get_serializer_class(self):
+        if self.is_fast_read():
+            return ProductRowSerializer
+        return super().get_serializer_class()
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        if self.action == "list":
+            qs = filter_products(qs, self.request.query_params)
+        query = self.get_search_query()
+        ids = []
+        if query:
+            ids = search.search(query, limit=RankedPagination.max_page_size)
+            qs = qs.filter(pk__in=ids) if ids else qs.none()
+        if self.action == "list":
+            # After the search, like the q in the facet cache key.
+            self.facet_queryset = qs
+        if ids:
+            rank = Case(
+                *(When(pk=pk, then=position) for position, pk in enumerate(ids)),
+                output_field=IntegerField(),
+            )
+            qs = qs.order_by(rank)
+        if self.is_fast_read():
+            qs = qs.values(*ProductRowSerializer.fields)
+        return qs
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response.data["facets"] = cached_facet_counts(
+            self.facet_queryset, self.request.query_params
+        )
+        return response
+
+    async def aget_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response.data["facets"] = await acached_facet_counts(
+            self.facet_queryset, self.request.query_params
+        )
+        return response
+
     def perform_create(self, serializer):
         serializer.save(seller=self.request.user)
+
+
+class CatalogCacheStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(cache.stats())
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Now
+
+from products.cache import bump_version
+from products.models import Product
+from reviews.models import Review
+
+
+class Command(BaseCommand):
+    help = "Recompute every product's rating aggregates from its reviews."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        stars = {
+            field: Count("pk", filter=Q(rating=star))
+            for star, field in enumerate(Product.RATING_FIELDS, start=1)
+        }
+        rows = (
+            Review.objects.order_by()
+            .values("product")
+            .annotate(rating_count=Count("pk"), rating_sum=Sum("rating"), **stars)
+        )
+        fields = ["rating_count", "rating_sum", *Product.RATING_FIELDS]
+
+        with transaction.atomic():
+            Product.objects.update(**{field: 0 for field in fields}, updated_at=Now())
+            products = [
+                Product(pk=row.pop("product"), **row) for row in rows.iterator()
+            ]
+            Product.objects.bulk_update(
+                products, fields, batch_size=options["batch_size"]
+            )
+            bump_version(Product)
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt ratings for {len(products)} product(s).")
+        )
@@ -22,6 +22,13 @@ class Review(models.Model):
             )
         ]
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="review_created_idx"),
+            models.Index(
+                fields=["product", "-created_at", "-id"],
+                name="review_product_created_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user} => {self.product} ({self.rating})"
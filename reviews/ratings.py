@@ -0,0 +1,44 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Now
+
+from products.cache import bump_version
+from products.models import Product
+
+
+def _star_field(rating):
+    return Product.RATING_FIELDS[rating - 1]
+
+
+@transaction.atomic
+def apply_rating_change(old=None, new=None):
+    """
+    Move a review's contribution between products' rating aggregates.
+
+    ``old`` and ``new`` are ``(product_id, rating)`` pairs, or ``None`` for a
+    created or deleted review. Each affected product gets one UPDATE of
+    F() arithmetic, so concurrent reviews never lose each other's counts.
+    """
+    changes = defaultdict(lambda: defaultdict(int))
+    if old is not None:
+        product_id, rating = old
+        changes[product_id]["rating_count"] -= 1
+        changes[product_id]["rating_sum"] -= rating
+        changes[product_id][_star_field(rating)] -= 1
+    if new is not None:
+        product_id, rating = new
+        changes[product_id]["rating_count"] += 1
+        changes[product_id]["rating_sum"] += rating
+        changes[product_id][_star_field(rating)] += 1
+
+    for product_id in sorted(changes):
+        updates = {
+            field: F(field) + delta
+            for field, delta in changes[product_id].items()
+            if delta
+        }
+        if updates:
+            Product.objects.filter(pk=product_id).update(**updates, updated_at=Now())
+    bump_version(Product)
@@ -1,9 +1,11 @@
 from rest_framework import serializers
-from orders.models import Order
+
+from food_delivery.metrics import TimedSerializerMixin
+from orders.models import VerifiedPurchase
 from reviews.models import Review
 
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     product_id = serializers.PrimaryKeyRelatedField(
         queryset=Review._meta.get_field("product").remote_field.model.objects.all(),
         source="product",
@@ -37,8 +39,8 @@ class ReviewSerializer(serializers.ModelSerializer):
         product = attrs.get("product") or getattr(self.instance, "product", None)
 
         if request.method == "POST":
-            delivered = Order.objects.filter(
-                user=user, status=Order.STATUS_DELIVERED, items__product=product
+            delivered = VerifiedPurchase.objects.filter(
+                pk=(user.pk, product.pk)
             ).exists()
             if not delivered and not user.is_staff:
                 raise serializers.ValidationError(
@@ -1,3 +1,129 @@
-from django.test import TestCase
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import AsyncClient, TestCase
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from food_delivery.testing import QueryPlanAssertionsMixin
+from orders.models import VerifiedPurchase
+from products import cache as catalog_cache
+from products.models import Category, Product
+from reviews.models import Review
+
+
+class ReviewTestMixin:
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user(
+            username="customer", password="pass", role=User.ROLE_CUSTOMER
+        )
+        cls.seller = User.objects.create_user(
+            username="seller", password="pass", role=User.ROLE_SELLER
+        )
+        cls.product = Product.objects.create(
+            seller=cls.seller,
+            category=Category.objects.create(name="Pizza", slug="pizza"),
+            name="Margherita",
+            price=Decimal("5.00"),
+        )
+
+    def setUp(self):
+        cache.clear()
+        catalog_cache.get_cache().clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def post_review(self, rating=5, product=None):
+        return self.client.post(
+            "/api/reviews/reviews/",
+            {"product_id": (product or self.product).pk, "rating": rating},
+            format="json",
+        )
+
+
+class ReviewGateTests(ReviewTestMixin, TestCase):
+    def test_review_requires_verified_purchase(self):
+        self.assertEqual(self.post_review().status_code, 400)
+        VerifiedPurchase.objects.create(user=self.customer, product=self.product)
+        self.assertEqual(self.post_review().status_code, 201)
+
+
+class RatingAggregateTests(ReviewTestMixin, TestCase):
+    def assertRatings(self, count, avg, histogram):
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.rating_count, count)
+        self.assertEqual(self.product.rating_avg, avg)
+        self.assertEqual(
+            self.product.rating_histogram,
+            {str(star): n for star, n in zip(range(1, 6), histogram)},
+        )
+
+    def test_review_lifecycle_updates_aggregates(self):
+        VerifiedPurchase.objects.create(user=self.customer, product=self.product)
+        review_id = self.post_review(rating=4).data["id"]
+        self.assertRatings(1, Decimal("4.00"), [0, 0, 0, 1, 0])
+
+        admin = User.objects.create_user(
+            username="admin", password="pass", is_staff=True
+        )
+        self.client.force_authenticate(admin)
+        response = self.client.patch(
+            f"/api/reviews/reviews/{review_id}/", {"rating": 2}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertRatings(1, Decimal("2.00"), [0, 1, 0, 0, 0])
+
+        response = self.client.delete(f"/api/reviews/reviews/{review_id}/")
+        self.assertEqual(response.status_code, 204)
+        self.assertRatings(0, None, [0, 0, 0, 0, 0])
+
+    def test_rebuild_recomputes_from_reviews(self):
+        for rating in (5, 4, 4):
+            Review.objects.create(
+                user=User.objects.create_user(username=f"u{User.objects.count()}"),
+                product=self.product,
+                rating=rating,
+            )
+        call_command("rebuild_ratings", stdout=StringIO())
+        self.assertRatings(3, Decimal("4.33"), [0, 0, 0, 2, 1])
+
+        response = self.client.get(f"/api/products/products/{self.product.pk}/")
+        self.assertEqual(response.data["rating_avg"], "4.33")
+        self.assertEqual(response.data["rating_count"], 3)
+
+
+class ReviewQueryPlanTests(ReviewTestMixin, QueryPlanAssertionsMixin, TestCase):
+    def test_product_review_listing_uses_index(self):
+        self.assertUsesIndex(
+            Review.objects.filter(product=self.product).order_by("-created_at", "-id")[
+                :20
+            ],
+            "review_product_created_idx",
+        )
+
+    def test_review_gate_is_a_primary_key_lookup(self):
+        plan = self.query_plan(
+            VerifiedPurchase.objects.filter(pk=(self.customer.pk, self.product.pk))
+        )
+        self.assertIn("SEARCH", plan)
+        self.assertIn("user_id=? AND product_id=?", plan)
+
+
+class AsyncReviewListTests(ReviewTestMixin, TestCase):
+    async def test_async_list_matches_sync_and_is_throttled(self):
+        await Review.objects.acreate(user=self.customer, product=self.product, rating=4)
+        expected = await sync_to_async(self.client.get)(
+            f"/api/reviews/reviews/?product={self.product.pk}"
+        )
+        client = AsyncClient()
+        url = f"/api/reviews/async/reviews/?product={self.product.pk}"
+        response = await client.get(url)
+        self.assertEqual(response.json()["results"], expected.json()["results"])
+
+        # The viewset's "reviews" scope allows ten requests an hour.
+        statuses = [(await client.get(url)).status_code for _ in range(10)]
+        self.assertEqual(statuses[-1], 429)
@@ -1,10 +1,17 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
+from food_delivery.async_views import async_read_view
+
 from reviews.views import ReviewViewSet
 
 router = DefaultRouter()
 router.register(r"reviews", ReviewViewSet, basename="review")
 urlpatterns = [
+    path(
+        "async/reviews/",
+        async_read_view(ReviewViewSet, "list"),
+        name="review-async-list",
+    ),
     path("", include(router.urls)),
 ]
@@ -1,12 +1,17 @@
+from django.db import transaction
 from rest_framework import viewsets, mixins
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
-from rest_framework.throttling import ScopedRateThrottle
+
+from food_delivery.async_views import AsyncReadMixin
+from food_delivery.throttling import ScopedRateThrottle
 from reviews.models import Review
 from reviews.permissions import IsOwnerOrAdminWithTimeWindow
+from reviews.ratings import apply_rating_change
 from reviews.serializers import ReviewSerializer
 
 
 class ReviewViewSet(
+    AsyncReadMixin,
     viewsets.GenericViewSet,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
@@ -29,3 +34,20 @@ class ReviewViewSet(
         if user:
             qs = qs.filter(user_id=user)
         return qs
+
+    @transaction.atomic
+    def perform_create(self, serializer):
+        review = serializer.save()
+        apply_rating_change(new=(review.product_id, review.rating))
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        old = (serializer.instance.product_id, serializer.instance.rating)
+        review = serializer.save()
+        apply_rating_change(old=old, new=(review.product_id, review.rating))
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        old = (instance.product_id, instance.rating)
+        instance.delete()
+        apply_rating_change(old=old)